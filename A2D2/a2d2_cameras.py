@@ -0,0 +1,38 @@
+import re
+from collections import defaultdict
+
+# A2D2 camera folders and the tag each one uses in file names
+# (20180807145028_camera_frontcenter_000000091.png in .../camera/cam_front_center/)
+CAMERAS = {
+    'cam_front_center': 'frontcenter',
+    'cam_front_left': 'frontleft',
+    'cam_front_right': 'frontright',
+    'cam_side_left': 'sideleft',
+    'cam_side_right': 'sideright',
+    'cam_rear_center': 'rearcenter',
+}
+CAMERA_FOLDERS = {tag: folder for folder, tag in CAMERAS.items()}
+
+# <timestamp>_<kind>_<camera tag>_<frame>.png, kind is camera / label / instance
+FRAME_PATTERN = re.compile(r'(\d+)_(camera|label|instance)_([a-z]+)_(\d+)\.png$')
+
+def parse_frame_name(filename):
+    """Return (kind, camera folder, frame number) for an A2D2 frame file name, or None."""
+    match = FRAME_PATTERN.search(filename)
+    if match is None or match.group(3) not in CAMERA_FOLDERS:
+        return None
+    return match.group(2), CAMERA_FOLDERS[match.group(3)], match.group(4)
+
+def interleave(items, key):
+    """Round-robin items across groups (e.g. recording folder + camera), keeping order within a group.
+
+    Consecutive tasks then hit different directories, so no single folder on the NAS is a hotspot.
+    """
+    groups = defaultdict(list)
+    for item in items:
+        groups[key(item)].append(item)
+    queues = [groups[k] for k in sorted(groups)]
+    interleaved = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        interleaved.extend(q[i] for q in queues if i < len(q))
+    return interleaved
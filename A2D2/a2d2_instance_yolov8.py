@@ -1,64 +1,93 @@
 import cv2
 import numpy as np
 import os
-import re
 from tqdm import tqdm
 import yaml
 import multiprocessing
+from instance_targets import mask_to_targets, draw_preview
+from conversion_manifest import open_manifest, reset_manifest, filter_pending, record_results, atomic_write_text, atomic_imwrite
+from staged_pipeline import run_staged
+from a2d2_cameras import CAMERAS, parse_frame_name, interleave
+from tar_shards import SAMPLES_PER_SHARD, shard_name, chunk, write_shard, shard_is_complete, shard_signature
 
-def decode_pixel(pixel_value):
-    class_idx = pixel_value >> 10
-    return class_idx
+# Everything that changes the output of a frame; a change here reprocesses every frame on resume
+CONVERTER_PARAMS = {
+    'converter': 'a2d2_instance_yolov8',
+    'class_offset': -1,  # YOLOv8 uses 0-indexed classes
+    'epsilon_factor': 0.005,
+    'jpeg_quality': 95,
+}
 
-def process_image_and_mask(img_path, mask_path, labels_folder, images_folder):
-    mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
-    
-    unique_values = np.unique(mask)
-    instances = [value for value in unique_values if value != 0]
+# Concurrency of each stage of the staged pipeline: NAS reader threads, polygonization
+# processes (None = one per CPU) and JPEG encoder/writer threads
+READER_THREADS = 8
+POLYGON_WORKERS = None
+WRITER_THREADS = 4
+
+def frame_params():
+    # The requested targets change what a frame produces, so they are part of its signature
+    return dict(CONVERTER_PARAMS, targets=sorted(output_targets))
+
+def mask_to_outputs(mask):
+    # One decode and labelling pass serves every target in output_targets
+    return mask_to_targets(mask, output_targets, class_offset=CONVERTER_PARAMS['class_offset'],
+                           epsilon_factor=CONVERTER_PARAMS['epsilon_factor'])
+
+def preview_image(img, outputs):
+    return draw_preview(img.copy(), outputs['preview'])
+
+def write_outputs(img_path, img, outputs, labels_folder, images_folder):
+    stem = os.path.splitext(os.path.basename(img_path))[0]
+    jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), CONVERTER_PARAMS['jpeg_quality']]
     
-    yolo_annotations = []
+    # Copy and convert the image file to JPG
+    output_image_path = os.path.join(images_folder, stem + '.jpg')
     
-    for instance in instances:
-        class_idx = decode_pixel(instance)
-        
-        instance_mask = (mask == instance).astype(np.uint8) * 255
-        contours, _ = cv2.findContours(instance_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # Convert to YOLOv8 format
-            epsilon = 0.005 * cv2.arcLength(largest_contour, True)
-            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-            
-            height, width = mask.shape[:2]
-            polygon = approx.reshape(-1, 2)
-            polygon = polygon.astype(float)
-            polygon[:, 0] /= width
-            polygon[:, 1] /= height
-            
-            flat_polygon = polygon.reshape(-1).tolist()
-            yolo_line = [class_idx - 1] + flat_polygon  # YOLOv8 uses 0-indexed classes
-            yolo_annotations.append(yolo_line)
+    # Convert to JPG and save. The image goes first and every file is renamed into
+    # place, so a label file only ever exists next to a complete image
+    atomic_imwrite(output_image_path, img, jpeg_params)
+    written = [output_image_path]
     
-    # Generate label file name
-    label_file = os.path.splitext(os.path.basename(img_path))[0] + '.txt'
-    label_path = os.path.join(labels_folder, label_file)
+    if 'preview' in outputs:
+        preview_path = os.path.join(previews_folder, stem + '.jpg')
+        atomic_imwrite(preview_path, preview_image(img, outputs), jpeg_params)
+        written.append(preview_path)
+    if 'rle' in outputs:
+        rle_path = os.path.join(rle_folder, stem + '.json')
+        atomic_write_text(rle_path, outputs['rle'])
+        written.append(rle_path)
+    if 'boxes' in outputs:
+        boxes_path = os.path.join(boxes_folder, stem + '.txt')
+        atomic_write_text(boxes_path, outputs['boxes'])
+        written.append(boxes_path)
     
     # Write YOLO annotations to file
-    with open(label_path, 'w') as f:
-        for annotation in yolo_annotations:
-            f.write(' '.join(map(str, annotation)) + '\n')
-    
-    # Copy and convert the image file to JPG
-    output_image_file = os.path.splitext(os.path.basename(img_path))[0] + '.jpg'
-    output_image_path = os.path.join(images_folder, output_image_file)
-    
-    # Read the image, convert to JPG, and save
+    if 'polygons' in outputs:
+        label_path = os.path.join(labels_folder, stem + '.txt')
+        atomic_write_text(label_path, outputs['polygons'])
+        written.append(label_path)
+
+    return written
+
+def process_image_and_mask(img_path, mask_path, labels_folder, images_folder):
+    mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
+    outputs = mask_to_outputs(mask)
     img = cv2.imread(img_path)
-    cv2.imwrite(output_image_path, img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+    return write_outputs(img_path, img, outputs, labels_folder, images_folder)
+
+# Staged pipeline: raw file bytes are read by threads, only the mask bytes go to the
+# polygonization processes, and the camera PNG is decoded and re-encoded by writer threads
+def read_frame(task):
+    mask_path, image_path = task
+    return np.fromfile(mask_path, dtype=np.uint8), np.fromfile(image_path, dtype=np.uint8)
+
+def polygonize_frame(mask_bytes):
+    return mask_to_outputs(cv2.imdecode(mask_bytes, cv2.IMREAD_UNCHANGED))
 
-    return label_file, output_image_file
+def write_frame(task, outputs, image_bytes):
+    mask_path, image_path = task
+    img = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
+    return write_outputs(image_path, img, outputs, labels_folder, images_folder)
 
 # Root folder paths
 image_root = "/media/parashuram/AutoData/A2D2/camera_lidar_semantic/"
@@ -68,9 +97,23 @@ output_root = "/media/parashuram/AutoData2/video_out/"
 # Create output folders if they don't exist
 labels_folder = os.path.join(output_root, "labels")
 images_folder = os.path.join(output_root, "images")
+shards_folder = os.path.join(output_root, "shards")
+boxes_folder = os.path.join(output_root, "labels_boxes")
+rle_folder = os.path.join(output_root, "rle")
+previews_folder = os.path.join(output_root, "previews")
 os.makedirs(labels_folder, exist_ok=True)
 os.makedirs(images_folder, exist_ok=True)
 
+# 'files' writes loose images/ and labels/, 'shards' writes tar shards with JSON offset indexes
+output_format = 'files'
+
+# Outputs to produce from each mask (see instance_targets.OUTPUT_TARGETS):
+# 'polygons', 'boxes', 'rle', 'preview'. Adding one costs only its serialisation
+output_targets = ['polygons']
+
+# Camera folders to convert (see a2d2_cameras.CAMERAS); None converts all six in the same pass
+cameras = None
+
 # Function to create YOLOv8 YAML file
 def create_yaml_file():
     # A2D2 dataset classes (you may need to adjust this list based on your specific dataset)
@@ -93,44 +136,141 @@ def create_yaml_file():
     
     print(f"Created YOLOv8 YAML file: {yaml_path}")
 
-def process_file(mask_path):
-    # Extract the matching part of the filename
-    match = re.search(r'(\d+_instance_frontcenter_\d+\.png)', mask_path)
-    if match:
-        common_part = match.group(1)
-        image_file = common_part.replace('instance', 'camera')
-        
+def find_image_path(mask_path):
+    # Match <timestamp>_instance_<camera>_<frame>.png for any of the A2D2 cameras
+    parsed = parse_frame_name(os.path.basename(mask_path))
+    if parsed is not None and parsed[0] == 'instance' and (cameras is None or parsed[1] in cameras):
         relative_path = os.path.relpath(mask_path, mask_root)
         image_path = os.path.join(image_root, relative_path.replace('instance', 'camera'))
         
         if os.path.exists(image_path):
-            return process_image_and_mask(image_path, mask_path, labels_folder, images_folder)
-    return None, None
+            return image_path
+    return None
 
-# Function to process all folders
-def process_all_folders():
+def frame_stream(mask_path):
+    # (recording folder, camera): the unit that lives in one directory on disk
+    recording = os.path.relpath(mask_path, mask_root).split(os.sep)[0]
+    return recording, parse_frame_name(os.path.basename(mask_path))[1]
+
+def process_file(mask_path):
+    image_path = find_image_path(mask_path)
+    if image_path is not None:
+        return process_image_and_mask(image_path, mask_path, labels_folder, images_folder)
+    return None
+
+def process_pending(item):
+    index, (mask_path, image_path) = item
+    return index, process_image_and_mask(image_path, mask_path, labels_folder, images_folder)
+
+def find_frames():
     all_mask_files = []
     for root, _, files in os.walk(mask_root):
         for file in files:
             if file.endswith('.png'):
                 all_mask_files.append(os.path.join(root, file))
     
-    num_cpus = multiprocessing.cpu_count()
-    pool = multiprocessing.Pool(processes=num_cpus)
+    frames = []
+    for mask_path in sorted(all_mask_files):
+        image_path = find_image_path(mask_path)
+        if image_path is not None:
+            frames.append((mask_path, image_path))
+    
+    # Every camera of every recording comes from this one walk; interleave the streams so
+    # the shared pool spreads reads across directories instead of draining one at a time
+    return interleave(frames, key=lambda frame: frame_stream(frame[0]))
+
+def frame_sample(mask_path, image_path):
+    mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
+    outputs = mask_to_outputs(mask)
+    img = cv2.imread(image_path)
+    jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), CONVERTER_PARAMS['jpeg_quality']]
+    members = {'jpg': cv2.imencode('.jpg', img, jpeg_params)[1].tobytes()}
+    if 'polygons' in outputs:
+        members['txt'] = outputs['polygons'].encode()
+    if 'boxes' in outputs:
+        members['boxes.txt'] = outputs['boxes'].encode()
+    if 'rle' in outputs:
+        members['rle.json'] = outputs['rle'].encode()
+    if 'preview' in outputs:
+        members['preview.jpg'] = cv2.imencode('.jpg', preview_image(img, outputs), jpeg_params)[1].tobytes()
+    return sample_key(image_path), members
+
+def sample_key(image_path):
+    return os.path.splitext(os.path.basename(image_path))[0]
+
+def convert_shard(item):
+    tar_path, frames, signature = item
+    return write_shard(tar_path, (frame_sample(mask_path, image_path) for mask_path, image_path in frames),
+                       signature=signature)
+
+# Function to process all folders into tar shards instead of loose images/ and labels/ files
+def process_all_folders_to_shards(samples_per_shard=SAMPLES_PER_SHARD):
+    os.makedirs(shards_folder, exist_ok=True)
+    # Shards are per camera (a2d2-frontleft-000000.tar, ...) so a loader can pick its cameras
+    by_camera = {}
+    for frame in find_frames():
+        by_camera.setdefault(frame_stream(frame[0])[1], []).append(frame)
+    
+    shards = []
+    for camera, camera_frames in sorted(by_camera.items()):
+        for shard_index, frames in enumerate(chunk(camera_frames, samples_per_shard)):
+            tar_path = os.path.join(shards_folder, shard_name(f"a2d2-{CAMERAS[camera]}", shard_index))
+            signature = shard_signature([path for frame in frames for path in frame], frame_params())
+            if not shard_is_complete(tar_path, [sample_key(image_path) for _, image_path in frames], signature):
+                shards.append((tar_path, frames, signature))
+    shards = interleave(shards, key=lambda shard: frame_stream(shard[1][0][0])[1])
+    print(f"Writing {len(shards)} shards to {shards_folder}")
     
-    results = list(tqdm(pool.imap(process_file, all_mask_files), 
-                        total=len(all_mask_files), 
-                        desc="Processing files", 
-                        unit="file"))
+    # One worker per shard, so shards are written concurrently and each is self-contained
+    with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
+        for _ in tqdm(pool.imap_unordered(convert_shard, shards), total=len(shards), desc="Writing shards", unit="shard"):
+            pass
+
+# Function to process all folders
+def process_all_folders(resume=True, staged=True):
+    frames = [(mask_path, [mask_path, image_path], (mask_path, image_path)) for mask_path, image_path in find_frames()]
+    for target, folder in [('boxes', boxes_folder), ('rle', rle_folder), ('preview', previews_folder)]:
+        if target in output_targets:
+            os.makedirs(folder, exist_ok=True)
+    
+    # The manifest remembers finished frames, so a rerun only converts new or changed ones
+    manifest = open_manifest(os.path.join(output_root, 'conversion_manifest.sqlite'))
+    if not resume:
+        reset_manifest(manifest)
+    pending, skipped = filter_pending(manifest, frames, frame_params())
+    print(f"Skipping {skipped} up-to-date files, {len(pending)} to process.")
     
-    pool.close()
-    pool.join()
+    tasks = [task for _, _, task in pending]
+    if staged:
+        results = tqdm(run_staged(tasks, read_frame, polygonize_frame, write_frame,
+                                  readers=READER_THREADS, workers=POLYGON_WORKERS, writers=WRITER_THREADS),
+                       total=len(pending), 
+                       desc="Processing files", 
+                       unit="file")
+        processed = record_results(manifest, pending, results)
+    else:
+        num_cpus = multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes=num_cpus)
+        
+        results = tqdm(pool.imap_unordered(process_pending, enumerate(tasks)), 
+                       total=len(pending), 
+                       desc="Processing files", 
+                       unit="file")
+        processed = record_results(manifest, pending, results)
+        
+        pool.close()
+        pool.join()
+    manifest.close()
     
-    processed_files = [result for result in results if result[0] is not None]
-    print(f"Processed {len(processed_files)} files.")
+    print(f"Processed {processed} files.")
 
 # Main execution
 if __name__ == '__main__':
     create_yaml_file()
-    process_all_folders()
+    if output_format == 'shards':
+        process_all_folders_to_shards()
+    else:
+        # labels/ is flat here; split_train_n_val.py (mode 'links') builds labels/{train,val} and
+        # their polygon stores, which is where readYolov8Dataset.py looks
+        process_all_folders()
     print("Processing complete.")
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+from PIL import Image
+
+from instance_polygonizer import mask_to_yolo_annotations, format_yolo_line
+from mask2yolo import load_color_mapping, build_class_lut, mask_to_segments, segments_to_label_text, CONSOLIDATED_CLASSES, EXCLUDED_CLASSES
+from conversion_manifest import atomic_write_text
+
+# Benchmarks the A2D2 -> YOLOv8-seg converters on synthetic frames, so no dataset is needed.
+# 'instance' is the a2d2_instance_yolov8.py / test9.py path (uint16 class<<10 | id masks through
+# instance_polygonizer), 'semantic' is mask2yolo.py (RGB label images through the class LUT).
+
+STAGES = ['decode', 'polygonize', 'format', 'encode', 'write']
+INSTANCE_CLASSES = 7
+
+def synthetic_class_list():
+    # A2D2-like class_list.json: every consolidated subclass, the excluded classes and filler classes
+    names = [sub for subs in CONSOLIDATED_CLASSES.values() for sub in subs] + EXCLUDED_CLASSES
+    names += [f"Class {i}" for i in range(55 - len(names))]
+    rng = np.random.default_rng(1234)
+    colors = rng.choice(1 << 24, size=len(names), replace=False)
+    return {f"#{int(c):06x}": name for c, name in zip(colors, names)}
+
+def random_shape(img, rng, value, width, height):
+    # Mix of ellipses and convex-ish polygons, sized like cars, pedestrians and signs
+    cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+    if rng.random() < 0.5:
+        axes = (int(rng.integers(5, width // 10)), int(rng.integers(5, height // 8)))
+        cv2.ellipse(img, (cx, cy), axes, float(rng.integers(0, 180)), 0, 360, value, -1)
+    else:
+        radius = int(rng.integers(10, width // 8))
+        angles = np.sort(rng.random(int(rng.integers(4, 10))) * 2 * np.pi)
+        radii = radius * (0.5 + 0.5 * rng.random(len(angles)))
+        pts = np.stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)], axis=1).astype(np.int32)
+        cv2.fillPoly(img, [pts], value)
+
+def synthetic_instance_mask(rng, width, height, instances):
+    mask = np.zeros((height, width), dtype=np.uint16)
+    for instance_id in range(instances):
+        class_idx = int(rng.integers(1, INSTANCE_CLASSES + 1))
+        random_shape(mask, rng, (class_idx << 10) | instance_id, width, height)
+    return mask
+
+def synthetic_label_image(rng, width, height, instances, palette):
+    # Large background regions first (road, sky, ...), then objects on top; RGB like the A2D2 label PNGs
+    label = np.zeros((height, width, 3), dtype=np.uint8)
+    band = height // 4
+    for i in range(4):
+        label[i * band:(i + 1) * band] = palette[int(rng.integers(len(palette)))]
+    for _ in range(instances):
+        random_shape(label, rng, tuple(int(c) for c in palette[int(rng.integers(len(palette)))]), width, height)
+    return label
+
+def synthetic_camera_image(rng, width, height):
+    # Smooth structure plus sensor noise, so JPEG encoding costs about what a real frame does
+    small = rng.integers(0, 256, size=(height // 32, width // 32, 3), dtype=np.uint8)
+    img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-8, 9, size=img.shape, dtype=np.int16)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def png_bytes(img):
+    _, buf = cv2.imencode('.png', img)
+    return buf
+
+def timed(stage_times, stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    stage_times[stage].append((time.perf_counter() - start) * 1000)
+    return result
+
+def bench_instance(frames, out_dir):
+    stage_times = {stage: [] for stage in STAGES}
+    for i, (mask_png, camera_png) in enumerate(frames):
+        mask, img = timed(stage_times, 'decode', lambda: (cv2.imdecode(mask_png, cv2.IMREAD_UNCHANGED),
+                                                          cv2.imdecode(camera_png, cv2.IMREAD_COLOR)))
+        annotations = timed(stage_times, 'polygonize', mask_to_yolo_annotations, mask)
+        label_text = timed(stage_times, 'format', lambda: ''.join(format_yolo_line(a) + '\n' for a in annotations))
+        jpg = timed(stage_times, 'encode', lambda: cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])[1])
+        timed(stage_times, 'write', write_sample, out_dir, f"instance_{i}", jpg.tobytes(), label_text)
+    return stage_times
+
+def bench_semantic(frames, out_dir, class_lut):
+    stage_times = {stage: [] for stage in STAGES}
+    for i, (label_png, camera_png) in enumerate(frames):
+        mask, img = timed(stage_times, 'decode', lambda: (np.array(Image.open(io.BytesIO(label_png.tobytes()))),
+                                                          Image.open(io.BytesIO(camera_png.tobytes())).convert('RGB')))
+        segments = timed(stage_times, 'polygonize', mask_to_segments, mask, class_lut)
+        label_text = timed(stage_times, 'format', segments_to_label_text, segments, img.width, img.height)
+
+        def encode():
+            buf = io.BytesIO()
+            img.save(buf, 'JPEG')
+            return buf.getvalue()
+        jpg = timed(stage_times, 'encode', encode)
+        timed(stage_times, 'write', write_sample, out_dir, f"semantic_{i}", jpg, label_text)
+    return stage_times
+
+def write_sample(out_dir, stem, jpg, label_text):
+    with open(os.path.join(out_dir, stem + '.jpg'), 'wb') as f:
+        f.write(jpg)
+    atomic_write_text(os.path.join(out_dir, stem + '.txt'), label_text)
+
+def summarize(stage_times, warmup):
+    summary = {}
+    total = 0.0
+    for stage, times in stage_times.items():
+        times = np.array(times[warmup:] or times)
+        summary[stage] = {
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95)),
+        }
+        total += summary[stage]['mean_ms']
+    summary['total_ms'] = total
+    summary['frames_per_sec'] = 1000.0 / total if total else 0.0
+    return summary
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the A2D2 -> YOLOv8-seg converters on synthetic frames')
+    parser.add_argument('--frames', type=int, default=20, help='Frames per converter')
+    parser.add_argument('--warmup', type=int, default=2, help='Leading frames left out of the statistics')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1208)
+    parser.add_argument('--instances', type=int, nargs='+', default=[10, 50, 100],
+                        help='Scene densities (objects per frame) to benchmark')
+    parser.add_argument('--class_list', type=str, help="A2D2 class_list.json; a synthetic palette is used if omitted")
+    parser.add_argument('--converters', nargs='+', default=['instance', 'semantic'], choices=['instance', 'semantic'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default='bench_converters.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_path = args.class_list
+        if json_path is None:
+            json_path = os.path.join(work_dir, 'class_list.json')
+            with open(json_path, 'w') as f:
+                json.dump(synthetic_class_list(), f)
+        color_map, class_map = load_color_mapping(json_path)
+        class_lut = build_class_lut(color_map, class_map)
+        with open(json_path, 'r') as f:
+            palette = np.array([[int(h.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4)] for h in json.load(f)], dtype=np.uint8)
+
+        out_dir = os.path.join(work_dir, 'out')
+        os.makedirs(out_dir)
+
+        results = {}
+        for instances in args.instances:
+            rng = np.random.default_rng(args.seed)
+            print(f"Generating {args.frames} frames with {instances} objects each...")
+            cameras = [png_bytes(synthetic_camera_image(rng, args.width, args.height)) for _ in range(args.frames)]
+            results[instances] = {}
+
+            if 'instance' in args.converters:
+                frames = [(png_bytes(synthetic_instance_mask(rng, args.width, args.height, instances)), camera)
+                          for camera in cameras]
+                results[instances]['instance'] = summarize(bench_instance(frames, out_dir), args.warmup)
+
+            if 'semantic' in args.converters:
+                # cv2 writes BGR, the converter reads RGB through PIL; flip so the palette colours survive
+                frames = [(png_bytes(synthetic_label_image(rng, args.width, args.height, instances, palette)[..., ::-1]), camera)
+                          for camera in cameras]
+                results[instances]['semantic'] = summarize(bench_semantic(frames, out_dir, class_lut), args.warmup)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': sys.version.split()[0],
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'params': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for instances, converters in results.items():
+        for converter, summary in converters.items():
+            stages = '  '.join(f"{stage}={summary[stage]['mean_ms']:.1f}" for stage in STAGES)
+            print(f"{converter:<9} {instances:>4} objects: {summary['frames_per_sec']:6.2f} frames/s  ({stages} ms)")
+    print(f"Saved results to {args.output}")
+
+if __name__ == '__main__':
+    main()
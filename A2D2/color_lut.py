@@ -0,0 +1,61 @@
+import os
+import json
+import hashlib
+import numpy as np
+from scipy import ndimage
+
+# Class-index image value for colours that are not in the mapping (excluded or unknown)
+UNMAPPED = 0
+
+def pack_rgb(mask):
+    # (H, W, 3) uint8 RGB -> (H, W) uint32 keys 0xRRGGBB
+    mask = mask[..., :3]
+    return (mask[..., 0].astype(np.uint32) << 16) | (mask[..., 1].astype(np.uint32) << 8) | mask[..., 2]
+
+def build_class_lut(color_map, class_map):
+    """Dense 2**24 lookup table from packed RGB key to class_id + 1 (0 = unmapped)."""
+    if len(class_map) > 254:
+        raise ValueError(f"Too many classes for a uint8 lookup table: {len(class_map)}")
+
+    lut = np.full(1 << 24, UNMAPPED, dtype=np.uint8)
+    for (r, g, b), cls in color_map.items():
+        lut[(r << 16) | (g << 8) | b] = class_map[cls] + 1
+    return lut
+
+def lut_cache_key(*sources):
+    h = hashlib.sha1()
+    for source in sources:
+        h.update(source if isinstance(source, bytes) else json.dumps(source, sort_keys=True).encode())
+    return h.hexdigest()
+
+def save_class_lut(cache_path, lut, class_map, key):
+    # Write both files under temporary names first so a crash never leaves a mismatched pair
+    tmp_lut = cache_path + '.tmp.npy'
+    np.save(tmp_lut, lut)
+    with open(cache_path + '.json.tmp', 'w') as f:
+        json.dump({'key': key, 'class_map': class_map}, f)
+    os.replace(tmp_lut, cache_path + '.npy')
+    os.replace(cache_path + '.json.tmp', cache_path + '.json')
+
+def load_class_lut(cache_path, key=None):
+    """Return (lut, class_map) from the cache, or (None, None) if missing or stale.
+
+    The table is memory-mapped, so every worker shares the same pages.
+    """
+    try:
+        with open(cache_path + '.json', 'r') as f:
+            meta = json.load(f)
+        if key is not None and meta['key'] != key:
+            return None, None
+        lut = np.load(cache_path + '.npy', mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return lut, meta['class_map']
+
+def decode_classes(mask, lut):
+    """Map an RGB label image to a class-index image (class_id + 1, 0 = unmapped) in one pass."""
+    return lut[pack_rgb(mask)]
+
+def present_classes(class_image):
+    # Bounding box per class, None for classes absent from the frame
+    return ndimage.find_objects(class_image)
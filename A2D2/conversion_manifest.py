@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import sqlite3
+import cv2
+
+# How many finished frames to buffer before committing to the manifest
+COMMIT_EVERY = 200
+
+def open_manifest(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''CREATE TABLE IF NOT EXISTS frames (
+                        frame TEXT PRIMARY KEY,
+                        signature TEXT NOT NULL,
+                        outputs TEXT NOT NULL,
+                        done_at REAL NOT NULL)''')
+    conn.commit()
+    return conn
+
+def reset_manifest(conn):
+    conn.execute('DELETE FROM frames')
+    conn.commit()
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+def input_signature(input_paths, params):
+    # A frame is up to date only if every input has the same size and mtime and the
+    # converter parameters are unchanged
+    stats = []
+    for path in input_paths:
+        st = os.stat(path)
+        stats.append([path, st.st_size, st.st_mtime_ns])
+    return json.dumps([stats, params_key(params)])
+
+def load_done(conn):
+    return {frame: (signature, json.loads(outputs))
+            for frame, signature, outputs in conn.execute('SELECT frame, signature, outputs FROM frames')}
+
+def filter_pending(conn, frames, params, check_outputs=True):
+    """Split frames into (pending, skipped).
+
+    frames is a list of (frame_key, input_paths, task). Returned pending entries are
+    (frame_key, signature, task); frames whose inputs or parameters changed, or whose
+    recorded outputs have gone missing, are pending again.
+    """
+    done = load_done(conn)
+    pending = []
+    skipped = 0
+    for frame_key, input_paths, task in frames:
+        try:
+            signature = input_signature(input_paths, params)
+        except OSError:
+            continue
+        previous = done.get(frame_key)
+        if previous is not None and previous[0] == signature:
+            if not check_outputs or all(os.path.exists(p) for p in previous[1]):
+                skipped += 1
+                continue
+        pending.append((frame_key, signature, task))
+    return pending, skipped
+
+def record_done(conn, frame_key, signature, outputs):
+    # Outputs written by an earlier run that this run did not rewrite (e.g. a frame that
+    # moved from val to train) are stale and removed
+    row = conn.execute('SELECT outputs FROM frames WHERE frame = ?', (frame_key,)).fetchone()
+    if row is not None:
+        for path in set(json.loads(row[0])) - set(outputs):
+            if os.path.exists(path):
+                os.remove(path)
+    conn.execute('INSERT OR REPLACE INTO frames (frame, signature, outputs, done_at) VALUES (?, ?, ?, ?)',
+                 (frame_key, signature, json.dumps(outputs), time.time()))
+
+def record_results(conn, pending, results):
+    """Record worker results as they arrive; results yields (index_into_pending, outputs or None)."""
+    recorded = 0
+    for index, outputs in results:
+        if outputs is None:
+            continue
+        frame_key, signature, _ = pending[index]
+        record_done(conn, frame_key, signature, outputs)
+        recorded += 1
+        if recorded % COMMIT_EVERY == 0:
+            conn.commit()
+    conn.commit()
+    return recorded
+
+def temp_path(path):
+    # Keep the extension so writers that pick the format from it (cv2.imwrite) still work
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.{os.getpid()}.tmp{ext}")
+
+def atomic_write_text(path, text):
+    tmp = temp_path(path)
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def atomic_imwrite(path, img, params=None):
+    tmp = temp_path(path)
+    if not cv2.imwrite(tmp, img, params or []):
+        raise IOError(f"Failed to write image: {path}")
+    os.replace(tmp, path)
+
+def atomic_pil_save(path, image, format):
+    tmp = temp_path(path)
+    image.save(tmp, format)
+    os.replace(tmp, path)
@@ -0,0 +1,76 @@
+import os
+import re
+import hashlib
+from polygon_store import build_split_stores
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# A2D2 recordings are named after their start time (20180807_145028 or 20180807145028)
+SEQUENCE_PATTERN = re.compile(r'(\d{8})_?(\d{6})')
+
+def sequence_id(name):
+    match = SEQUENCE_PATTERN.search(os.path.basename(name))
+    if match:
+        return match.group(1) + match.group(2)
+    return None
+
+def split_key(name, group_by_sequence=True):
+    # Grouping by recording keeps near-identical neighbouring frames out of both subsets
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if group_by_sequence:
+        return sequence_id(stem) or stem
+    return stem
+
+def assign_subset(key, val_fraction=0.2, seed=''):
+    """Return 'train' or 'val' from a stable hash of key, independent of file location and process."""
+    digest = hashlib.sha1(f"{seed}{key}".encode()).digest()
+    return 'val' if int.from_bytes(digest[:8], 'big') / 2 ** 64 < val_fraction else 'train'
+
+def split_images(image_files, val_fraction=0.2, group_by_sequence=True, seed=''):
+    subsets = {'train': [], 'val': []}
+    for image_file in image_files:
+        subsets[assign_subset(split_key(image_file, group_by_sequence), val_fraction, seed)].append(image_file)
+    return subsets
+
+def list_images(images_dir):
+    return sorted(os.path.join(images_dir, f) for f in os.listdir(images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+def label_path_for(image_path, images_dir, labels_dir):
+    relative = os.path.relpath(image_path, images_dir)
+    return os.path.join(labels_dir, os.path.splitext(relative)[0] + '.txt')
+
+def write_split_lists(subsets, output_dir):
+    """Write YOLO train.txt / val.txt image lists; YOLO finds labels by swapping images/ for labels/."""
+    paths = {}
+    for subset, image_files in subsets.items():
+        paths[subset] = os.path.join(output_dir, f"{subset}.txt")
+        tmp = paths[subset] + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(os.path.abspath(p) + '\n' for p in image_files)
+        os.replace(tmp, paths[subset])
+    return paths
+
+def _link(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Hard links cannot cross filesystems
+        os.symlink(os.path.abspath(src), dst)
+
+def link_split_tree(subsets, images_dir, labels_dir, output_root, build_stores=True):
+    """Build images/<subset> and labels/<subset> under output_root as hard links to the originals,
+    plus labels/<subset>.polystore polygon stores (read by readYolov8Dataset.py) if build_stores."""
+    for subset, image_files in subsets.items():
+        image_out = os.path.join(output_root, 'images', subset)
+        label_out = os.path.join(output_root, 'labels', subset)
+        os.makedirs(image_out, exist_ok=True)
+        os.makedirs(label_out, exist_ok=True)
+        for image_path in image_files:
+            _link(image_path, os.path.join(image_out, os.path.basename(image_path)))
+            label_path = label_path_for(image_path, images_dir, labels_dir)
+            if os.path.exists(label_path):
+                _link(label_path, os.path.join(label_out, os.path.basename(label_path)))
+    if build_stores:
+        build_split_stores(os.path.join(output_root, 'labels'))
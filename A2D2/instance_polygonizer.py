@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+from scipy import ndimage
+
+# A2D2 instance masks are uint16: class index in the upper 6 bits, instance id in the lower 10
+INSTANCE_BITS = 10
+INSTANCE_MASK = (1 << INSTANCE_BITS) - 1
+
+def decode_pixel(pixel_value):
+    class_idx = int(pixel_value) >> INSTANCE_BITS
+    instance_id = int(pixel_value) & INSTANCE_MASK
+    return class_idx, instance_id
+
+def label_instances(mask):
+    # One histogram pass over the frame gives every value present; a 65536-entry
+    # lookup table then maps raw values to dense labels 1..n (0 stays background)
+    counts = np.bincount(mask.ravel(), minlength=65536)
+    counts[0] = 0
+    values = np.flatnonzero(counts)
+
+    lut = np.zeros(65536, dtype=np.uint16 if len(values) < 65535 else np.uint32)
+    lut[values] = np.arange(1, len(values) + 1)
+    labels = lut[mask]
+
+    # Bounding box of every label, in the same single pass
+    slices = ndimage.find_objects(labels, max_label=len(values))
+    return values, labels, slices
+
+def padded_box(box, height, width):
+    # Keep one background pixel around the instance so the crop traces exactly like the full frame
+    rows, cols = box
+    y0 = max(rows.start - 1, 0)
+    y1 = min(rows.stop + 1, height)
+    x0 = max(cols.start - 1, 0)
+    x1 = min(cols.stop + 1, width)
+    return y0, y1, x0, x1
+
+def iter_instance_crops(mask):
+    """Yield (pixel_value, box, origin, instance_mask) for every non-zero instance in a uint16 mask.
+
+    box is the instance's (rows, cols) slices, instance_mask the 0/255 uint8 crop of the padded
+    box and origin its (x0, y0) in the frame.
+    """
+    height, width = mask.shape[:2]
+    values, labels, slices = label_instances(mask)
+
+    for label, (value, box) in enumerate(zip(values, slices), start=1):
+        if box is None:
+            continue
+        y0, y1, x0, x1 = padded_box(box, height, width)
+        instance_mask = (labels[y0:y1, x0:x1] == label).astype(np.uint8) * 255
+        yield value, box, (x0, y0), instance_mask
+
+def largest_contour(instance_mask, origin):
+    contours, _ = cv2.findContours(instance_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=origin)
+    if contours:
+        return max(contours, key=cv2.contourArea)
+    return None
+
+def find_instance_contours(mask):
+    """Yield (pixel_value, largest_contour) for every non-zero instance in a uint16 mask.
+
+    Contours are traced only inside each instance's bounding box and returned in
+    full-frame coordinates, in ascending pixel-value order (same as np.unique).
+    """
+    for value, _, origin, instance_mask in iter_instance_crops(mask):
+        contour = largest_contour(instance_mask, origin)
+        if contour is not None:
+            yield value, contour
+
+def simplify_contour(contour, epsilon_factor=0.005):
+    epsilon = epsilon_factor * cv2.arcLength(contour, True)
+    return cv2.approxPolyDP(contour, epsilon, True)
+
+def normalize_polygon(approx, width, height):
+    polygon = approx.reshape(-1, 2)
+    polygon = polygon.astype(float)
+    polygon[:, 0] /= width
+    polygon[:, 1] /= height
+    return polygon.reshape(-1).tolist()
+
+def mask_to_yolo_annotations(mask, class_offset=-1, epsilon_factor=0.005):
+    """Convert a uint16 A2D2 instance mask to YOLOv8-seg lines [class, x1, y1, ..., xn, yn].
+
+    class_offset is added to the decoded A2D2 class index (-1 gives 0-indexed YOLO classes).
+    """
+    height, width = mask.shape[:2]
+    yolo_annotations = []
+
+    for value, largest_contour in find_instance_contours(mask):
+        class_idx, _ = decode_pixel(value)
+        approx = simplify_contour(largest_contour, epsilon_factor)
+        flat_polygon = normalize_polygon(approx, width, height)
+        yolo_annotations.append([class_idx + class_offset] + flat_polygon)
+
+    return yolo_annotations
+
+def format_yolo_line(annotation):
+    return ' '.join(map(str, annotation))
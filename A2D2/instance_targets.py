@@ -0,0 +1,120 @@
+import json
+import cv2
+import numpy as np
+from instance_polygonizer import decode_pixel, iter_instance_crops, largest_contour, simplify_contour, normalize_polygon, format_yolo_line
+
+# Every output is built from one decode and one labelling pass of the instance mask:
+#   polygons - YOLOv8-seg lines (labels/)
+#   boxes    - YOLO detection lines "class cx cy w h" (labels_boxes/)
+#   rle      - COCO-style uncompressed RLE per instance, one JSON per frame (rle/)
+#   preview  - camera image with instance outlines and class names (previews/)
+OUTPUT_TARGETS = ['polygons', 'boxes', 'rle', 'preview']
+
+CLASS_NAMES = {
+    1: "cars", 2: "pedestrians", 3: "trucks", 4: "smallVehicle",
+    5: "utilityVehicle", 6: "bicycle", 7: "tractor"
+}
+
+# Same colours as the a2d2_seg_yolo.py / instance_with_class.py viewers (np.random.seed(42))
+PREVIEW_COLORS = np.random.RandomState(42).randint(0, 255, size=(8, 3), dtype=np.uint8)
+
+def get_class_name(class_idx):
+    return CLASS_NAMES.get(class_idx, "unknown")
+
+def instance_rle(instance_mask, origin, height, width):
+    # COCO counts run over the frame in column-major order, starting with background. Only the
+    # columns the instance spans are materialised; the rest of the frame is added as background
+    x0, y0 = origin
+    crop_h, crop_w = instance_mask.shape
+    columns = np.zeros((crop_w, height), dtype=np.uint8)
+    columns[:, y0:y0 + crop_h] = instance_mask.T > 0
+    flat = columns.ravel()
+
+    edges = np.flatnonzero(np.diff(flat)) + 1
+    runs = np.diff(np.concatenate([[0], edges, [flat.size]]))
+    if flat[0]:
+        runs = np.concatenate([[0], runs])
+    runs[0] += x0 * height
+    trailing = (width - x0 - crop_w) * height
+    if not flat[-1]:
+        runs[-1] += trailing
+    elif trailing:
+        runs = np.concatenate([runs, [trailing]])
+    return {'size': [height, width], 'counts': runs.tolist()}
+
+def extract_instances(mask, targets, class_offset=-1, epsilon_factor=0.005):
+    """Decode a uint16 A2D2 instance mask once into everything the requested targets need.
+
+    Returns (height, width, instances), one dict per instance with its class, 'box'
+    (x, y, w, h in pixels) and, as the targets require, 'contour', 'polygon' and 'rle'.
+    """
+    height, width = mask.shape[:2]
+    need_contour = 'polygons' in targets or 'preview' in targets
+    instances = []
+
+    for value, (rows, cols), origin, instance_mask in iter_instance_crops(mask):
+        class_idx, instance_id = decode_pixel(value)
+        instance = {
+            'class_idx': class_idx,
+            'class_id': class_idx + class_offset,
+            'instance_id': instance_id,
+            'box': (cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start),
+        }
+        if need_contour:
+            contour = largest_contour(instance_mask, origin)
+            if contour is None:
+                continue
+            instance['contour'] = contour
+            if 'polygons' in targets:
+                instance['polygon'] = normalize_polygon(simplify_contour(contour, epsilon_factor), width, height)
+        if 'rle' in targets:
+            instance['rle'] = instance_rle(instance_mask, origin, height, width)
+            instance['area'] = int(np.count_nonzero(instance_mask))
+        instances.append(instance)
+
+    return height, width, instances
+
+def polygons_text(instances):
+    return ''.join(format_yolo_line([inst['class_id']] + inst['polygon']) + '\n' for inst in instances)
+
+def boxes_text(instances, width, height):
+    lines = []
+    for inst in instances:
+        x, y, w, h = inst['box']
+        lines.append(format_yolo_line([inst['class_id'], (x + w / 2) / width, (y + h / 2) / height, w / width, h / height]))
+    return ''.join(line + '\n' for line in lines)
+
+def rle_json(instances, width, height):
+    annotations = [{'category_id': inst['class_id'], 'instance_id': inst['instance_id'], 'bbox': list(inst['box']),
+                    'area': inst['area'], 'segmentation': inst['rle']} for inst in instances]
+    return json.dumps({'width': width, 'height': height, 'annotations': annotations})
+
+def preview_shapes(instances):
+    # Only what draw_preview needs, so it is cheap to pass between processes
+    return [(inst['class_idx'], inst['contour']) for inst in instances]
+
+def draw_preview(vis_img, shapes):
+    for class_idx, contour in shapes:
+        color = tuple(map(int, PREVIEW_COLORS[class_idx % len(PREVIEW_COLORS)]))
+        cv2.drawContours(vis_img, [contour], 0, color, 2)
+
+        M = cv2.moments(contour)
+        if M["m00"] != 0:
+            cX = int(M["m10"] / M["m00"])
+            cY = int(M["m01"] / M["m00"])
+            cv2.putText(vis_img, get_class_name(class_idx), (cX, cY), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    return vis_img
+
+def mask_to_targets(mask, targets, class_offset=-1, epsilon_factor=0.005):
+    """Serialise one instance mask to every requested target: {target: text or preview shapes}."""
+    height, width, instances = extract_instances(mask, targets, class_offset, epsilon_factor)
+    outputs = {}
+    if 'polygons' in targets:
+        outputs['polygons'] = polygons_text(instances)
+    if 'boxes' in targets:
+        outputs['boxes'] = boxes_text(instances, width, height)
+    if 'rle' in targets:
+        outputs['rle'] = rle_json(instances, width, height)
+    if 'preview' in targets:
+        outputs['preview'] = preview_shapes(instances)
+    return outputs
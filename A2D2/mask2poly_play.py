@@ -2,10 +2,7 @@ import cv2
 import numpy as np
 import os
 import re
-
-def decode_pixel(pixel_value):
-    class_idx = pixel_value >> 10
-    return class_idx
+from instance_polygonizer import decode_pixel, find_instance_contours, simplify_contour, normalize_polygon, format_yolo_line
 
 def get_class_name(class_idx):
     class_map = {
@@ -18,45 +15,30 @@ def process_image_and_mask(img_path, mask_path):
     img = cv2.imread(img_path)
     mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
     
-    unique_values = np.unique(mask)
-    instances = [value for value in unique_values if value != 0]
-    
     np.random.seed(42)
     colors = np.random.randint(0, 255, size=(8, 3), dtype=np.uint8)
     
+    height, width = mask.shape[:2]
     yolo_annotations = []
     
-    for instance in instances:
-        class_idx = decode_pixel(instance)
+    for instance, largest_contour in find_instance_contours(mask):
+        class_idx, _ = decode_pixel(instance)
         class_name = get_class_name(class_idx)
         
-        instance_mask = (mask == instance).astype(np.uint8) * 255
-        contours, _ = cv2.findContours(instance_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        color = tuple(map(int, colors[class_idx]))
+        cv2.drawContours(img, [largest_contour], 0, color, 2)
         
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            color = tuple(map(int, colors[class_idx]))
-            cv2.drawContours(img, [largest_contour], 0, color, 2)
-            
-            M = cv2.moments(largest_contour)
-            if M["m00"] != 0:
-                cX = int(M["m10"] / M["m00"])
-                cY = int(M["m01"] / M["m00"])
-                cv2.putText(img, class_name, (cX, cY), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            
-            # Convert to YOLOv8 format
-            epsilon = 0.005 * cv2.arcLength(largest_contour, True)
-            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-            
-            height, width = mask.shape[:2]
-            polygon = approx.reshape(-1, 2)
-            polygon = polygon.astype(float)
-            polygon[:, 0] /= width
-            polygon[:, 1] /= height
-            
-            flat_polygon = polygon.reshape(-1).tolist()
-            yolo_line = [class_idx - 1] + flat_polygon  # YOLOv8 uses 0-indexed classes
-            yolo_annotations.append(yolo_line)
+        M = cv2.moments(largest_contour)
+        if M["m00"] != 0:
+            cX = int(M["m10"] / M["m00"])
+            cY = int(M["m01"] / M["m00"])
+            cv2.putText(img, class_name, (cX, cY), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        
+        # Convert to YOLOv8 format
+        approx = simplify_contour(largest_contour)
+        flat_polygon = normalize_polygon(approx, width, height)
+        yolo_line = [class_idx - 1] + flat_polygon  # YOLOv8 uses 0-indexed classes
+        yolo_annotations.append(yolo_line)
     
     return img, yolo_annotations
 
@@ -89,7 +71,7 @@ while current_index < len(mask_files):
             
             print(f"YOLOv8 annotations for {image_file}:")
             for annotation in yolo_annotations:
-                print(' '.join(map(str, annotation)))
+                print(format_yolo_line(annotation))
             print()
             
             key = cv2.waitKey(0) & 0xFF
@@ -1,4 +1,5 @@
 import os
+import io
 import json
 import numpy as np
 import cv2
@@ -6,16 +7,44 @@ from PIL import Image
 from tqdm import tqdm
 import yaml
 from multiprocessing import Pool, cpu_count
+from color_lut import build_class_lut, lut_cache_key, save_class_lut, load_class_lut, decode_classes, present_classes
+from instance_polygonizer import padded_box
+from dataset_split import assign_subset, split_key
+from a2d2_cameras import CAMERAS, interleave
+from tar_shards import SAMPLES_PER_SHARD, shard_name, chunk, write_shard, shard_is_complete, shard_signature
+from conversion_manifest import open_manifest, reset_manifest, filter_pending, record_results, atomic_write_text, atomic_pil_save
+from polygon_store import build_split_stores
+
+# Excluded classes and class consolidation
+EXCLUDED_CLASSES = ['Sky', 'Buildings', 'Nature object', 'Grid structure', 'Blurred area', 'Rain dirt']
+CONSOLIDATED_CLASSES = {
+    'Car': ['Car 1', 'Car 2', 'Car 3', 'Car 4'],
+    'Bicycle': ['Bicycle 1', 'Bicycle 2', 'Bicycle 3', 'Bicycle 4'],
+    'Pedestrian': ['Pedestrian 1', 'Pedestrian 2', 'Pedestrian 3'],
+    'Truck': ['Truck 1', 'Truck 2', 'Truck 3'],
+    'Small vehicles': ['Small vehicles 1', 'Small vehicles 2', 'Small vehicles 3'],
+    'Traffic signal': ['Traffic signal 1', 'Traffic signal 2', 'Traffic signal 3'],
+    'Traffic sign': ['Traffic sign 1', 'Traffic sign 2', 'Traffic sign 3'],
+    'Utility vehicle': ['Utility vehicle 1', 'Utility vehicle 2']
+}
+
+# Fraction of frames assigned to val, and whether whole recordings go to one subset
+VAL_FRACTION = 0.2
+GROUP_BY_SEQUENCE = True
+
+# Pack labels/train and labels/val into labels/train.polystore / labels/val.polystore after converting
+BUILD_LABEL_STORES = True
+
+# Per-worker class lookup table, memory-mapped from the on-disk cache on first use
+_class_lut = None
 
 def print_folder_info(a2d2_path):
     print("Folder Information:")
-    for folder in os.listdir(a2d2_path):
-        folder_path = os.path.join(a2d2_path, folder)
-        if os.path.isdir(folder_path):
-            image_folder = os.path.join(folder_path, "camera", "cam_front_center")
-            if os.path.exists(image_folder):
-                image_files = [f for f in os.listdir(image_folder) if f.endswith(".png")]
-                print(f"Folder: {folder}, Number of files: {len(image_files)}")
+    counts = {}
+    for folder, camera, _ in find_frames(a2d2_path):
+        counts[(folder, camera)] = counts.get((folder, camera), 0) + 1
+    for (folder, camera), count in sorted(counts.items()):
+        print(f"Folder: {folder}, Camera: {camera}, Number of files: {count}")
     print("\n")
 
 def convert_filename(original_filename):
@@ -30,21 +59,8 @@ def load_color_mapping(json_path):
     color_map = {}
     class_map = {}
     
-    # Excluded classes and class consolidation
-    excluded_classes = ['Sky', 'Buildings', 'Nature object', 'Grid structure', 'Blurred area', 'Rain dirt']
-    consolidated_classes = {
-        'Car': ['Car 1', 'Car 2', 'Car 3', 'Car 4'],
-        'Bicycle': ['Bicycle 1', 'Bicycle 2', 'Bicycle 3', 'Bicycle 4'],
-        'Pedestrian': ['Pedestrian 1', 'Pedestrian 2', 'Pedestrian 3'],
-        'Truck': ['Truck 1', 'Truck 2', 'Truck 3'],
-        'Small vehicles': ['Small vehicles 1', 'Small vehicles 2', 'Small vehicles 3'],
-        'Traffic signal': ['Traffic signal 1', 'Traffic signal 2', 'Traffic signal 3'],
-        'Traffic sign': ['Traffic sign 1', 'Traffic sign 2', 'Traffic sign 3'],
-        'Utility vehicle': ['Utility vehicle 1', 'Utility vehicle 2']
-    }
-    
     class_id = 0
-    for consolidated_class, subclasses in consolidated_classes.items():
+    for consolidated_class, subclasses in CONSOLIDATED_CLASSES.items():
         for subclass in subclasses:
             for color_hex, class_name in data.items():
                 if class_name == subclass:
@@ -55,7 +71,7 @@ def load_color_mapping(json_path):
         class_id += 1
     
     for color_hex, class_name in data.items():
-        if class_name not in excluded_classes and not any(class_name in subclasses for subclasses in consolidated_classes.values()):
+        if class_name not in EXCLUDED_CLASSES and not any(class_name in subclasses for subclasses in CONSOLIDATED_CLASSES.values()):
             color = tuple(int(color_hex.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
             color_map[color] = class_name
             if class_name not in class_map:
@@ -64,23 +80,57 @@ def load_color_mapping(json_path):
     
     return color_map, class_map
 
-def mask_to_segments(mask, color_map, class_map):
+def class_table_key(json_path):
+    # The consolidation rules are baked into the table, so they are part of the cache key
+    with open(json_path, 'rb') as f:
+        return lut_cache_key(f.read(), EXCLUDED_CLASSES, CONSOLIDATED_CLASSES)
+
+def conversion_params(json_path):
+    # Frames (manifest) and shards converted with the same class table and split settings are reused
+    return {'converter': 'mask2yolo', 'classes': class_table_key(json_path),
+            'val_fraction': VAL_FRACTION, 'group_by_sequence': GROUP_BY_SEQUENCE}
+
+def frame_input_paths(a2d2_path, folder, camera, filename):
+    return [os.path.join(a2d2_path, folder, "camera", camera, filename),
+            os.path.join(a2d2_path, folder, "label", camera, convert_filename(filename))]
+
+def get_class_lut(json_path, cache_path):
+    key = class_table_key(json_path)
+    lut, class_map = load_class_lut(cache_path, key)
+    if lut is None:
+        color_map, class_map = load_color_mapping(json_path)
+        save_class_lut(cache_path, build_class_lut(color_map, class_map), class_map, key)
+        lut, class_map = load_class_lut(cache_path, key)
+    return lut, class_map
+
+def mask_to_segments(mask, class_lut):
+    # Decode every pixel to a class index once, then trace only the classes present in the frame
+    class_image = decode_classes(mask, class_lut)
+    height, width = class_image.shape
+    
     segments = []
-    for color, cls in color_map.items():
-        class_mask = np.all(mask == color, axis=-1).astype(np.uint8) * 255
-        contours, _ = cv2.findContours(class_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for label, box in enumerate(present_classes(class_image), start=1):
+        if box is None:
+            continue
+        y0, y1, x0, x1 = padded_box(box, height, width)
+        class_mask = (class_image[y0:y1, x0:x1] == label).astype(np.uint8) * 255
+        contours, _ = cv2.findContours(class_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
         for contour in contours:
             if cv2.contourArea(contour) > 1:  # Filter out tiny contours
                 epsilon = 0.005 * cv2.arcLength(contour, True)
                 approx = cv2.approxPolyDP(contour, epsilon, True)
                 if len(approx) >= 3:  # Ensure we have at least a triangle
-                    segments.append((class_map[cls], approx.squeeze()))
+                    segments.append((label - 1, approx.squeeze()))
     return segments
 
-def process_file(args):
-    filename, folder, a2d2_path, yolo_path, color_map, class_map = args
-    image_folder = os.path.join(a2d2_path, folder, "camera", "cam_front_center")
-    mask_folder = os.path.join(a2d2_path, folder, "label", "cam_front_center")
+def convert_frame(args):
+    """Return (subset, output stem, RGB image, YOLOv8-seg label text), or None if the frame has no segments."""
+    global _class_lut
+    filename, folder, camera, a2d2_path, yolo_path, lut_path = args
+    if _class_lut is None:
+        _class_lut, _ = load_class_lut(lut_path)
+    image_folder = os.path.join(a2d2_path, folder, "camera", camera)
+    mask_folder = os.path.join(a2d2_path, folder, "label", camera)
     
     image_path = os.path.join(image_folder, filename)
     mask_filename = convert_filename(filename)
@@ -89,81 +139,184 @@ def process_file(args):
     image = Image.open(image_path)
     mask = np.array(Image.open(mask_path))
     
-    segments = mask_to_segments(mask, color_map, class_map)
+    segments = mask_to_segments(mask, _class_lut)
     
-    if segments:
-        img_w, img_h = image.size
-        
-        # Randomly assign to train or val (80% train, 20% val)
-        subset = "train" if np.random.rand() < 0.8 else "val"
-        
-        # Save image to YOLO dataset as JPG
-        new_filename = f"{folder}_{os.path.splitext(filename)[0]}.jpg"
-        image.convert('RGB').save(os.path.join(yolo_path, "images", subset, new_filename), 'JPEG')
-        
-        # Save YOLOv8-seg format annotations
-        label_filename = os.path.splitext(new_filename)[0] + ".txt"
-        label_path = os.path.join(yolo_path, "labels", subset, label_filename)
-        with open(label_path, "w") as f:
-            for class_id, poly in segments:
-                # Normalize polygon points
-                poly_norm = poly.astype(float)
-                poly_norm[:, 0] /= img_w
-                poly_norm[:, 1] /= img_h
-                
-                # Write in YOLOv8-seg format
-                f.write(f"{class_id}")
-                for px, py in poly_norm:
-                    f.write(f" {px} {py}")
-                f.write("\n")
+    if not segments:
+        return None
+    
+    img_w, img_h = image.size
+    stem = output_stem(folder, filename)
+    
+    # Assign to train or val by a stable hash of the recording, reproducible across runs and workers
+    subset = assign_subset(split_key(stem, GROUP_BY_SEQUENCE), VAL_FRACTION)
+    
+    return subset, stem, image.convert('RGB'), segments_to_label_text(segments, img_w, img_h)
+
+def segments_to_label_text(segments, img_w, img_h):
+    lines = []
+    for class_id, poly in segments:
+        # Normalize polygon points
+        poly_norm = poly.astype(float)
+        poly_norm[:, 0] /= img_w
+        poly_norm[:, 1] /= img_h
         
-        return True
-    return False
+        # YOLOv8-seg format
+        lines.append(f"{class_id}" + "".join(f" {px} {py}" for px, py in poly_norm) + "\n")
+    return "".join(lines)
+
+def output_stem(folder, filename):
+    return f"{folder}_{os.path.splitext(filename)[0]}"
+
+def process_file(args):
+    yolo_path = args[4]
+    frame = convert_frame(args)
+    if frame is None:
+        return []
+    subset, stem, image, label_text = frame
+    
+    # Save image to YOLO dataset as JPG; image first so a label never points at a partial image
+    image_out_path = os.path.join(yolo_path, "images", subset, stem + ".jpg")
+    atomic_pil_save(image_out_path, image, 'JPEG')
+    
+    # Save YOLOv8-seg format annotations
+    label_path = os.path.join(yolo_path, "labels", subset, stem + ".txt")
+    atomic_write_text(label_path, label_text)
+    
+    return [image_out_path, label_path]
+
+def process_pending(item):
+    index, args = item
+    return index, process_file(args)
+
+def convert_shard(item):
+    tar_path, args_list, signature = item
+    samples = []
+    for args in args_list:
+        frame = convert_frame(args)
+        if frame is not None:
+            _, stem, image, label_text = frame
+            buf = io.BytesIO()
+            image.save(buf, 'JPEG')
+            samples.append((stem, {'jpg': buf.getvalue(), 'txt': label_text.encode()}))
+    sources = [output_stem(args[1], args[0]) for args in args_list]
+    return write_shard(tar_path, samples, sources=sources, signature=signature)
 
-def convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path, num_files=None):
-    color_map, class_map = load_color_mapping(json_path)
+def find_frames(a2d2_path, num_files=None, cameras=None):
+    """List (folder, camera, filename) for every camera of every recording in one directory pass.
+
+    cameras restricts the camera folders (see a2d2_cameras.CAMERAS); None takes all six.
+    Frames are interleaved across (recording, camera) so workers do not all read one directory.
+    """
+    frames = []
+    for folder in sorted(os.listdir(a2d2_path)):
+        camera_root = os.path.join(a2d2_path, folder, "camera")
+        if not os.path.isdir(camera_root):
+            continue
+        for entry in sorted(os.scandir(camera_root), key=lambda e: e.name):
+            if not entry.is_dir() or entry.name not in CAMERAS or (cameras is not None and entry.name not in cameras):
+                continue
+            image_files = sorted(f for f in os.listdir(entry.path) if f.endswith(".png"))
+            
+            if num_files is not None:
+                image_files = image_files[:num_files]
+            
+            frames.extend((folder, entry.name, filename) for filename in image_files)
+    return interleave(frames, key=lambda frame: frame[:2])
+
+def write_dataset_yaml(yolo_path, class_map, train, val, filename="dataset.yaml"):
+    dataset_config = {
+        'train': train,
+        'val': val,
+        'nc': len(class_map),
+        'names': list(sorted(class_map.keys(), key=lambda x: class_map[x]))
+    }
     
+    with open(os.path.join(yolo_path, filename), "w") as f:
+        yaml.dump(dataset_config, f, default_flow_style=False)
+
+def convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path, num_files=None, lut_path=None, resume=True, cameras=None):
     os.makedirs(os.path.join(yolo_path, "images", "train"), exist_ok=True)
     os.makedirs(os.path.join(yolo_path, "images", "val"), exist_ok=True)
     os.makedirs(os.path.join(yolo_path, "labels", "train"), exist_ok=True)
     os.makedirs(os.path.join(yolo_path, "labels", "val"), exist_ok=True)
     
-    args_list = []
+    if lut_path is None:
+        lut_path = os.path.join(yolo_path, "class_lut")
+    _, class_map = get_class_lut(json_path, lut_path)
+    
+    frames = []
+    for folder, camera, filename in find_frames(a2d2_path, num_files, cameras):
+        frames.append((os.path.join(folder, filename), frame_input_paths(a2d2_path, folder, camera, filename),
+                       (filename, folder, camera, a2d2_path, yolo_path, lut_path)))
     
-    for folder in os.listdir(a2d2_path):
-        folder_path = os.path.join(a2d2_path, folder)
-        if os.path.isdir(folder_path):
-            image_folder = os.path.join(folder_path, "camera", "cam_front_center")
-            if os.path.exists(image_folder):
-                image_files = [f for f in os.listdir(image_folder) if f.endswith(".png")]
-                
-                if num_files is not None:
-                    image_files = image_files[:num_files]
-                
-                args_list.extend([(filename, folder, a2d2_path, yolo_path, color_map, class_map) for filename in image_files])
+    # Frames already converted with the same inputs and class table are skipped
+    params = conversion_params(json_path)
+    manifest = open_manifest(os.path.join(yolo_path, "conversion_manifest.sqlite"))
+    if not resume:
+        reset_manifest(manifest)
+    pending, skipped = filter_pending(manifest, frames, params)
+    print(f"Skipping {skipped} up-to-date files, {len(pending)} to process.")
     
     with Pool(processes=cpu_count()) as pool:
-        results = list(tqdm(pool.imap(process_file, args_list), total=len(args_list)))
+        results = tqdm(pool.imap_unordered(process_pending, enumerate(task for _, _, task in pending)), total=len(pending))
+        record_results(manifest, pending, results)
+    manifest.close()
     
-    dataset_config = {
-        'train': os.path.join(yolo_path, "images", "train"),
-        'val': os.path.join(yolo_path, "images", "val"),
-        'nc': len(class_map),
-        'names': list(sorted(class_map.keys(), key=lambda x: class_map[x]))
-    }
+    write_dataset_yaml(yolo_path, class_map, os.path.join(yolo_path, "images", "train"), os.path.join(yolo_path, "images", "val"))
+    if BUILD_LABEL_STORES:
+        for store_path in build_split_stores(os.path.join(yolo_path, "labels")):
+            print(f"Created polygon store: {store_path}")
+
+def convert_a2d2_to_yolov8seg_shards(a2d2_path, yolo_path, json_path, num_files=None, lut_path=None,
+                                     samples_per_shard=SAMPLES_PER_SHARD, cameras=None):
+    # Same conversion, but samples are streamed into train-<camera>-*.tar / val-<camera>-*.tar
+    # shards with JSON offset indexes instead of hundreds of thousands of loose files
+    shards_path = os.path.join(yolo_path, "shards")
+    os.makedirs(shards_path, exist_ok=True)
     
-    with open(os.path.join(yolo_path, "dataset.yaml"), "w") as f:
-        yaml.dump(dataset_config, f, default_flow_style=False)
+    if lut_path is None:
+        lut_path = os.path.join(yolo_path, "class_lut")
+    _, class_map = get_class_lut(json_path, lut_path)
+    
+    # The subset only depends on the name, so frames can be grouped before conversion
+    groups = {}
+    for folder, camera, filename in find_frames(a2d2_path, num_files, cameras):
+        subset = assign_subset(split_key(output_stem(folder, filename), GROUP_BY_SEQUENCE), VAL_FRACTION)
+        groups.setdefault((subset, camera), []).append((filename, folder, camera, a2d2_path, yolo_path, lut_path))
+    
+    # Shards built from unchanged inputs with the same class table and split settings are kept
+    params = conversion_params(json_path)
+    shards = []
+    for (subset, camera), args_list in sorted(groups.items()):
+        for shard_index, shard_args in enumerate(chunk(args_list, samples_per_shard)):
+            tar_path = os.path.join(shards_path, shard_name(f"{subset}-{CAMERAS[camera]}", shard_index))
+            signature = shard_signature([path for args in shard_args
+                                         for path in frame_input_paths(args[3], args[1], args[2], args[0])], params)
+            if not shard_is_complete(tar_path, [output_stem(args[1], args[0]) for args in shard_args], signature):
+                shards.append((tar_path, shard_args, signature))
+    shards = interleave(shards, key=lambda shard: shard[1][0][2])
+    print(f"Writing {len(shards)} shards to {shards_path}")
+    
+    with Pool(processes=cpu_count()) as pool:
+        for _ in tqdm(pool.imap_unordered(convert_shard, shards), total=len(shards)):
+            pass
+    
+    write_dataset_yaml(yolo_path, class_map, os.path.join(shards_path, "train-*.tar"), os.path.join(shards_path, "val-*.tar"),
+                       filename="dataset_shards.yaml")
 
 # Usage
-a2d2_path = "/media/parashuram/AutoData/A2D2/camera_lidar_semantic/"
-yolo_path = "/media/parashuram/AutoData2/a2d2_inst_seg/"
-json_path = "/media/parashuram/AutoData/A2D2/camera_lidar_semantic/class_list.json"
+if __name__ == '__main__':
+    a2d2_path = "/media/parashuram/AutoData/A2D2/camera_lidar_semantic/"
+    yolo_path = "/media/parashuram/AutoData2/a2d2_inst_seg/"
+    json_path = "/media/parashuram/AutoData/A2D2/camera_lidar_semantic/class_list.json"
+
+    print_folder_info(a2d2_path)
 
-print_folder_info(a2d2_path)
+    # To process all files in all folders:
+    convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path)
 
-# To process all files in all folders:
-convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path)
+    # To process only a specific number of files (e.g., 10) per folder:
+    #convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path, num_files=10)
 
-# To process only a specific number of files (e.g., 10) per folder:
-#convert_a2d2_to_yolov8seg(a2d2_path, yolo_path, json_path, num_files=10)
\ No newline at end of file
+    # To write tar shards instead of loose images/ and labels/ files:
+    #convert_a2d2_to_yolov8seg_shards(a2d2_path, yolo_path, json_path)
\ No newline at end of file
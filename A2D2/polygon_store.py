@@ -0,0 +1,171 @@
+import os
+import json
+import numpy as np
+
+# File layout: MAGIC, uint64 header length, JSON header, then each array 64-byte aligned.
+# The header records dtype, shape and offset of every array, so a reader memory-maps them directly.
+MAGIC = b'POLYSTR1'
+ALIGN = 64
+QUANT_SCALE = 65535
+
+def store_path_for(labels_dir):
+    return os.path.normpath(labels_dir) + '.polystore'
+
+def store_is_current(store_path, labels_dir):
+    # Not older than the label folder or any .txt in it (edited labels make the store stale)
+    if not os.path.exists(store_path):
+        return False
+    newest = os.path.getmtime(labels_dir)
+    with os.scandir(labels_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.txt'):
+                newest = max(newest, entry.stat().st_mtime)
+    return os.path.getmtime(store_path) >= newest
+
+def open_label_store(labels_dir):
+    """PolygonStore of labels_dir if one exists and is up to date, else None (read the .txt labels)."""
+    store_path = store_path_for(labels_dir)
+    if not os.path.isdir(labels_dir) or not store_is_current(store_path, labels_dir):
+        return None
+    return PolygonStore(store_path)
+
+def _pack_arrays(names, class_ids, image_offsets, poly_offsets, vertices, quantized):
+    arrays = {
+        'image_offsets': image_offsets,
+        'poly_offsets': poly_offsets,
+        'class_ids': class_ids,
+        'vertices': vertices,
+    }
+    header = {'names': names, 'quantized': quantized, 'arrays': {}}
+
+    # Offsets depend on the header length, which depends on the offsets; iterate until stable
+    header_len = 0
+    while True:
+        offset = len(MAGIC) + 8 + header_len
+        for key, array in arrays.items():
+            offset = -(-offset // ALIGN) * ALIGN
+            header['arrays'][key] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += array.nbytes
+        encoded = json.dumps(header).encode()
+        if len(encoded) == header_len:
+            return encoded, arrays
+        header_len = len(encoded)
+
+def write_polygon_store(path, images, quantize=False):
+    """Write [(image_name, [(class_id, polygon Nx2 normalised)])] to one memory-mappable file.
+
+    quantize stores vertices as uint16 (1/65535 steps) instead of float32, halving the size.
+    """
+    names = []
+    class_ids = []
+    image_offsets = [0]
+    poly_offsets = [0]
+    vertex_chunks = []
+    for name, annotations in images:
+        names.append(name)
+        for class_id, polygon in annotations:
+            polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+            class_ids.append(class_id)
+            vertex_chunks.append(polygon)
+            poly_offsets.append(poly_offsets[-1] + len(polygon))
+        image_offsets.append(len(class_ids))
+
+    vertices = np.concatenate(vertex_chunks) if vertex_chunks else np.zeros((0, 2), dtype=np.float32)
+    if quantize:
+        vertices = np.round(np.clip(vertices, 0, 1) * QUANT_SCALE).astype(np.uint16)
+
+    header, arrays = _pack_arrays(names, np.asarray(class_ids, dtype=np.int32),
+                                  np.asarray(image_offsets, dtype=np.int64),
+                                  np.asarray(poly_offsets, dtype=np.int64), vertices, quantize)
+
+    offsets = {key: spec['offset'] for key, spec in json.loads(header)['arrays'].items()}
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for key, array in arrays.items():
+            f.seek(offsets[key])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp, path)
+    return path
+
+class PolygonStore:
+    """Memory-mapped reader: store[i] or store.get(name) returns [(class_id, polygon Nx2 float32)]."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a polygon store: {path}")
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len))
+
+        self.names = header['names']
+        self.quantized = header['quantized']
+        self._index = {name: i for i, name in enumerate(self.names)}
+        for key, spec in header['arrays'].items():
+            shape = tuple(spec['shape'])
+            if np.prod(shape) == 0:
+                array = np.zeros(shape, dtype=spec['dtype'])
+            else:
+                array = np.memmap(path, dtype=spec['dtype'], mode='r', offset=spec['offset'], shape=shape)
+            setattr(self, key, array)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, i):
+        first, last = self.image_offsets[i], self.image_offsets[i + 1]
+        annotations = []
+        for p in range(first, last):
+            polygon = self.vertices[self.poly_offsets[p]:self.poly_offsets[p + 1]]
+            if self.quantized:
+                polygon = polygon.astype(np.float32) / QUANT_SCALE
+            annotations.append((int(self.class_ids[p]), np.asarray(polygon, dtype=np.float32)))
+        return annotations
+
+    def get(self, name, default=None):
+        i = self._index.get(name)
+        return default if i is None else self[i]
+
+def parse_yolo_label_text(text):
+    annotations = []
+    for line in text.splitlines():
+        data = line.split()
+        if len(data) < 5:
+            continue
+        annotations.append((int(data[0]), np.array(data[1:], dtype=np.float32).reshape(-1, 2)))
+    return annotations
+
+def labels_to_store(labels_dir, store_path=None, quantize=False):
+    """Pack a folder of YOLOv8-seg .txt labels into a polygon store (parsed once, here)."""
+    store_path = store_path or store_path_for(labels_dir)
+    label_files = sorted(f for f in os.listdir(labels_dir) if f.endswith('.txt'))
+
+    def images():
+        for label_file in label_files:
+            with open(os.path.join(labels_dir, label_file), 'r') as f:
+                yield os.path.splitext(label_file)[0], parse_yolo_label_text(f.read())
+
+    return write_polygon_store(store_path, images(), quantize=quantize)
+
+def build_split_stores(labels_root, quantize=False):
+    """One store per split folder (labels/train -> labels/train.polystore), the paths the viewer reads."""
+    stores = []
+    for split in sorted(os.listdir(labels_root)):
+        split_dir = os.path.join(labels_root, split)
+        if os.path.isdir(split_dir) and any(f.endswith('.txt') for f in os.listdir(split_dir)):
+            stores.append(labels_to_store(split_dir, quantize=quantize))
+    return stores
+
+def store_to_labels(store_path, labels_dir):
+    """Export a polygon store back to plain YOLOv8-seg .txt label files."""
+    store = PolygonStore(store_path)
+    os.makedirs(labels_dir, exist_ok=True)
+    for i, name in enumerate(store.names):
+        with open(os.path.join(labels_dir, name + '.txt'), 'w') as f:
+            for class_id, polygon in store[i]:
+                f.write(f"{class_id} " + ' '.join(f"{v:.6f}" for v in polygon.reshape(-1)) + '\n')
@@ -4,6 +4,7 @@ import os
 from pathlib import Path
 import yaml
 from screeninfo import get_monitors
+from polygon_store import open_label_store, store_path_for
 
 def read_yaml(yaml_path):
     with open(yaml_path, 'r') as file:
@@ -70,6 +71,12 @@ def display_dataset(yaml_path):
         print(f"Label directory not found: {label_dir}")
         return
     
+    # Prefer the binary polygon store next to the label folder (O(1) lookup, no text parsing),
+    # unless the .txt labels were changed after it was built
+    label_store = open_label_store(str(label_dir))
+    if label_store is not None:
+        print(f"Using polygon store: {store_path_for(str(label_dir))}")
+    
     image_files = sorted(image_dir.glob("*.jpg")) + sorted(image_dir.glob("*.jpeg")) + sorted(image_dir.glob("*.png"))
     total_images = len(image_files)
     images_with_labels = 0
@@ -86,7 +93,15 @@ def display_dataset(yaml_path):
         label_path = label_dir / (img_path.stem + ".txt")
         print(f"Checking for label file: {label_path}")
         
-        if label_path.exists():
+        if label_store is not None and img_path.stem in label_store:
+            annotations = label_store.get(img_path.stem)
+            if annotations:
+                image_with_annotations = draw_annotations(image.copy(), annotations, class_names)
+                images_with_labels += 1
+            else:
+                image_with_annotations = image.copy()
+                cv2.putText(image_with_annotations, "No valid annotations", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        elif label_path.exists():
             print(f"Label file found: {label_path}")
             try:
                 annotations = read_yolo_labels(str(label_path))
@@ -1,43 +1,34 @@
 import os
-import random
-import shutil
+from dataset_split import list_images, split_images, write_split_lists, link_split_tree
 
 # Set paths
 root_dir = '/media/parashuram/AutoData2/a2d2_instace_org/'
 images_dir = os.path.join(root_dir, 'images')
 labels_dir = os.path.join(root_dir, 'labels')
 
-# Create train and val subdirectories in both images and labels folders
-for parent_dir in [images_dir, labels_dir]:
-    os.makedirs(os.path.join(parent_dir, 'train'), exist_ok=True)
-    os.makedirs(os.path.join(parent_dir, 'val'), exist_ok=True)
-
 # Set split ratio (e.g., 0.8 for 80% train, 20% val)
 split_ratio = 0.9
 
+# Assign whole A2D2 recordings to one subset so neighbouring frames do not leak into val
+group_by_sequence = True
+
+# 'lists' writes train.txt / val.txt next to images/, 'links' builds a hard-linked
+# images/{train,val} + labels/{train,val} tree under link_root. Nothing is moved either way.
+mode = 'lists'
+link_root = os.path.join(root_dir, 'split')
+
 # Get all image files
-image_files = [f for f in os.listdir(images_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-
-# Shuffle the list
-random.shuffle(image_files)
-
-# Calculate split point
-split_point = int(len(image_files) * split_ratio)
-
-# Split and move files
-for i, file in enumerate(image_files):
-    src_img = os.path.join(images_dir, file)
-    src_label = os.path.join(labels_dir, os.path.splitext(file)[0] + '.txt')
-    
-    if i < split_point:
-        dst_img = os.path.join(images_dir, 'train', file)
-        dst_label = os.path.join(labels_dir, 'train', os.path.splitext(file)[0] + '.txt')
-    else:
-        dst_img = os.path.join(images_dir, 'val', file)
-        dst_label = os.path.join(labels_dir, 'val', os.path.splitext(file)[0] + '.txt')
-    
-    shutil.move(src_img, dst_img)
-    if os.path.exists(src_label):
-        shutil.move(src_label, dst_label)
-
-print(f"Split complete: {split_point} images in train, {len(image_files) - split_point} images in val")
\ No newline at end of file
+image_files = list_images(images_dir)
+
+# Subsets come from a stable hash of the recording (or frame) name, so re-running
+# gives the same split and new frames never reshuffle existing ones
+subsets = split_images(image_files, val_fraction=1 - split_ratio, group_by_sequence=group_by_sequence)
+
+if mode == 'lists':
+    paths = write_split_lists(subsets, root_dir)
+    print(f"Wrote {paths['train']} and {paths['val']}")
+else:
+    link_split_tree(subsets, images_dir, labels_dir, link_root)
+    print(f"Linked split tree under {link_root}")
+
+print(f"Split complete: {len(subsets['train'])} images in train, {len(subsets['val'])} images in val")
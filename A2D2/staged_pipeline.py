@@ -0,0 +1,121 @@
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+def _timed_call(fn, arg):
+    # Runs inside the process pool; the elapsed time feeds the utilisation report
+    start = time.perf_counter()
+    result = fn(arg)
+    return result, time.perf_counter() - start
+
+class _StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self.lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self.lock:
+            self.busy += elapsed
+            self.items += 1
+
+def run_staged(tasks, read_fn, compute_fn, write_fn, readers=8, workers=None, writers=4, max_in_flight=None):
+    """Run tasks through read -> compute -> write stages and yield (index, outputs) as frames finish.
+
+    read_fn(task) -> (compute_input, passthrough) runs in `readers` threads (disk / NAS bound).
+    compute_fn(compute_input) -> result runs in a pool of `workers` processes; it must be a
+    module-level function so it can be pickled.
+    write_fn(task, result, passthrough) -> outputs runs in `writers` threads (encode + write).
+
+    At most max_in_flight frames are between the start of reading and the end of writing, so
+    memory stays bounded however far the readers could run ahead. Per-stage utilisation is
+    printed once all tasks are done.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    max_in_flight = max_in_flight or 2 * (readers + workers + writers)
+
+    stats = [_StageStats('read', readers), _StageStats('compute', workers), _StageStats('write', writers)]
+    read_stats, compute_stats, write_stats = stats
+    slots = threading.BoundedSemaphore(max_in_flight)
+    done = queue.Queue()
+    stop = threading.Event()
+
+    read_pool = ThreadPoolExecutor(max_workers=readers)
+    compute_pool = ProcessPoolExecutor(max_workers=workers)
+    write_pool = ThreadPoolExecutor(max_workers=writers)
+    # Start the worker processes from this thread, before any reader thread exists to be forked
+    compute_pool.submit(int).result()
+
+    def fail(exc):
+        stop.set()
+        done.put((None, exc))
+
+    def write_stage(index, task, result, passthrough):
+        start = time.perf_counter()
+        try:
+            outputs = write_fn(task, result, passthrough)
+        except Exception as exc:
+            fail(exc)
+            return
+        write_stats.add(time.perf_counter() - start)
+        slots.release()
+        done.put((index, outputs))
+
+    def on_computed(index, task, passthrough, future):
+        try:
+            result, elapsed = future.result()
+        except Exception as exc:
+            fail(exc)
+            return
+        compute_stats.add(elapsed)
+        write_pool.submit(write_stage, index, task, result, passthrough)
+
+    def read_stage(index, task):
+        start = time.perf_counter()
+        try:
+            compute_input, passthrough = read_fn(task)
+        except Exception as exc:
+            fail(exc)
+            return
+        read_stats.add(time.perf_counter() - start)
+        future = compute_pool.submit(_timed_call, compute_fn, compute_input)
+        future.add_done_callback(lambda f: on_computed(index, task, passthrough, f))
+
+    def feed():
+        for index, task in enumerate(tasks):
+            while not slots.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            if stop.is_set():
+                return
+            read_pool.submit(read_stage, index, task)
+
+    wall_start = time.perf_counter()
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    try:
+        for _ in range(len(tasks)):
+            index, outputs = done.get()
+            if index is None:
+                raise outputs
+            yield index, outputs
+    finally:
+        stop.set()
+        feeder.join()
+        read_pool.shutdown(wait=True, cancel_futures=True)
+        compute_pool.shutdown(wait=True, cancel_futures=True)
+        write_pool.shutdown(wait=True)
+        print_stage_report(stats, time.perf_counter() - wall_start)
+
+def print_stage_report(stats, wall):
+    print(f"Stage utilisation over {wall:.1f}s:")
+    for stage in stats:
+        utilisation = stage.busy / (wall * stage.workers) if wall > 0 else 0.0
+        per_item = stage.busy / stage.items * 1000 if stage.items else 0.0
+        print(f"  {stage.name:<8} workers={stage.workers:<3} items={stage.items:<7} "
+              f"busy={stage.busy:8.1f}s  {per_item:7.1f} ms/item  utilisation={utilisation:6.1%}")
@@ -0,0 +1,100 @@
+import io
+import os
+import json
+import glob
+import tarfile
+
+# Samples per shard; each shard is written whole by one worker, so this is also the unit of parallelism
+SAMPLES_PER_SHARD = 1000
+
+def shard_name(prefix, shard_index):
+    return f"{prefix}-{shard_index:06d}.tar"
+
+def index_path(tar_path):
+    return os.path.splitext(tar_path)[0] + '.json'
+
+def chunk(items, size=SAMPLES_PER_SHARD):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def shard_signature(input_paths, params=None):
+    """Size and mtime of every file a shard is built from, plus the conversion parameters,
+    in the JSON form kept in the shard index."""
+    inputs = []
+    for path in input_paths:
+        st = os.stat(path)
+        inputs.append([str(path), st.st_size, st.st_mtime_ns])
+    return json.loads(json.dumps({'inputs': inputs, 'params': params}, sort_keys=True))
+
+def write_shard(tar_path, samples, sources=None, signature=None):
+    """Write samples [(key, {ext: bytes})] to a tar shard plus a JSON index of member offsets.
+
+    Members are named <key>.<ext> (WebDataset convention). sources lists every input the
+    shard was built from when some produce no sample; signature (shard_signature) is stored
+    for shard_is_complete. Both files are written under temporary names and renamed into
+    place, so a shard is either complete or absent.
+    """
+    tmp_tar = tar_path + '.tmp'
+    index = {'samples': []}
+    with tarfile.open(tmp_tar, 'w') as tar:
+        for key, members in samples:
+            entry = {'key': key, 'members': {}}
+            for ext, data in members.items():
+                info = tarfile.TarInfo(f"{key}.{ext}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                # addfile works on a copy of info, so derive the data offset from the end of
+                # the member: data is padded up to the next 512-byte block
+                padded_size = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                entry['members'][ext] = [tar.offset - padded_size, info.size]
+            index['samples'].append(entry)
+    if sources is not None:
+        index['sources'] = list(sources)
+    if signature is not None:
+        index['signature'] = signature
+
+    tmp_index = index_path(tar_path) + '.tmp'
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_tar, tar_path)
+    os.replace(tmp_index, index_path(tar_path))
+    return tar_path
+
+def shard_is_complete(tar_path, keys, signature=None):
+    # A shard from an earlier run is reused only if it holds exactly the same samples, built from
+    # unchanged inputs with the same parameters
+    try:
+        index = read_index(tar_path)
+    except (OSError, ValueError):
+        return False
+    built_from = index.get('sources', [s['key'] for s in index['samples']])
+    return os.path.exists(tar_path) and built_from == list(keys) and index.get('signature') == signature
+
+def read_index(tar_path):
+    with open(index_path(tar_path), 'r') as f:
+        return json.load(f)
+
+def list_shards(output_dir, prefix='*'):
+    return sorted(glob.glob(os.path.join(output_dir, f"{prefix}-*.tar")))
+
+def iter_shard(tar_path):
+    """Read a shard sequentially, yielding (key, {ext: bytes})."""
+    index = read_index(tar_path)
+    with open(tar_path, 'rb') as f:
+        for entry in index['samples']:
+            yield entry['key'], _read_members(f, entry)
+
+def read_sample(tar_path, key, index=None):
+    """Random access to one sample by key using the offset index, without tarfile parsing."""
+    index = index or read_index(tar_path)
+    for entry in index['samples']:
+        if entry['key'] == key:
+            with open(tar_path, 'rb') as f:
+                return _read_members(f, entry)
+    raise KeyError(key)
+
+def _read_members(f, entry):
+    members = {}
+    for ext, (offset, size) in entry['members'].items():
+        f.seek(offset)
+        members[ext] = f.read(size)
+    return members
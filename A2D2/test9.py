@@ -5,41 +5,13 @@ import re
 from tqdm import tqdm
 import yaml
 import multiprocessing
-
-def decode_pixel(pixel_value):
-    class_idx = pixel_value >> 10
-    return class_idx
+from instance_polygonizer import mask_to_yolo_annotations, format_yolo_line
 
 def process_image_and_mask(img_path, mask_path, labels_folder, images_folder):
     mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
     
-    unique_values = np.unique(mask)
-    instances = [value for value in unique_values if value != 0]
-    
-    yolo_annotations = []
-    
-    for instance in instances:
-        class_idx = decode_pixel(instance)
-        
-        instance_mask = (mask == instance).astype(np.uint8) * 255
-        contours, _ = cv2.findContours(instance_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # Convert to YOLOv8 format
-            epsilon = 0.005 * cv2.arcLength(largest_contour, True)
-            approx = cv2.approxPolyDP(largest_contour, epsilon, True)
-            
-            height, width = mask.shape[:2]
-            polygon = approx.reshape(-1, 2)
-            polygon = polygon.astype(float)
-            polygon[:, 0] /= width
-            polygon[:, 1] /= height
-            
-            flat_polygon = polygon.reshape(-1).tolist()
-            yolo_line = [class_idx - 1] + flat_polygon  # YOLOv8 uses 0-indexed classes
-            yolo_annotations.append(yolo_line)
+    # YOLOv8 uses 0-indexed classes
+    yolo_annotations = mask_to_yolo_annotations(mask, class_offset=-1)
     
     # Generate label file name
     label_file = os.path.splitext(os.path.basename(img_path))[0] + '.txt'
@@ -48,7 +20,7 @@ def process_image_and_mask(img_path, mask_path, labels_folder, images_folder):
     # Write YOLO annotations to file
     with open(label_path, 'w') as f:
         for annotation in yolo_annotations:
-            f.write(' '.join(map(str, annotation)) + '\n')
+            f.write(format_yolo_line(annotation) + '\n')
     
     # Copy and convert the image file to JPG
     output_image_file = os.path.splitext(os.path.basename(img_path))[0] + '.jpg'
@@ -1,44 +1,216 @@
-import json
+import os
+import sys
+import hashlib
+import ijson
+from array import array
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
-from ultralytics.utils.downloads import download
 from pathlib import Path
 
-def argoverse2yolo(set):
+# Shared tar shard writer lives with the A2D2 converters
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'A2D2'))
+from tar_shards import SAMPLES_PER_SHARD, shard_name, chunk, write_shard, shard_is_complete, shard_signature
+from argoverse_archive import archive_reader
+
+# Threads writing label files; the work is small writes, so more threads than cores is fine
+WRITER_THREADS = 16
+
+# Image size used when the annotation file's image records carry none
+DEFAULT_IMAGE_SIZE = (1920, 1200)
+
+def open_annotations(set, archive=None):
+    # set is a JSON file on disk, or a member name inside archive (an ArchiveReader)
+    return archive.open(set) if archive is not None else open(set, 'rb')
+
+def load_argoverse_columns(set, archive=None):
+    # One incremental pass over the annotation JSON (ijson): only the fields the labels need are
+    # kept, appended to flat typed columns, so the parsed document is never held in memory
+    seq_dirs, names = [], []
+    sids, widths, heights = array('q'), array('d'), array('d')
+    image_ids, classes, bboxes = array('q'), array('q'), array('d')
+    with open_annotations(set, archive) as f:
+        print(f"Reading {set}...")
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == 'annotations.item.bbox.item':
+                bboxes.append(value)
+            elif prefix == 'annotations.item.image_id':
+                image_ids.append(value)
+            elif prefix == 'annotations.item.category_id':
+                classes.append(value)
+            elif prefix == 'images.item.name':
+                names.append(value)
+            elif prefix == 'images.item.sid':
+                sids.append(value)
+            elif prefix == 'images.item.width':
+                widths.append(value)
+            elif prefix == 'images.item.height':
+                heights.append(value)
+            elif prefix == 'seq_dirs.item':
+                seq_dirs.append(value)
+
+    sizes = np.empty((len(names), 2))
+    sizes[:] = DEFAULT_IMAGE_SIZE
+    if len(widths) == len(names) and len(heights) == len(names):
+        sizes[:, 0] = widths
+        sizes[:, 1] = heights
+    return seq_dirs, names, np.asarray(sids), sizes, np.asarray(image_ids), np.asarray(classes), np.asarray(bboxes).reshape(-1, 4)
+
+def argoverse_labels(set, include_empty=False, archive=None):
+    # {(seq_dir, image_name): YOLO label text}; include_empty adds images without boxes as ''
+    seq_dirs, names, sids, sizes, image_ids, classes, bboxes = load_argoverse_columns(set, archive)
+
+    # Normalise every box at once, with each image's own size (annotation image ids index 'images')
+    x, y, w, h = bboxes.T
+    img_w, img_h = sizes[image_ids].T
+    boxes = np.stack([(x + w / 2) / img_w, (y + h / 2) / img_h, w / img_w, h / img_h], axis=1)
+
+    # Group by image with one stable sort, keeping the file order of boxes within an image
+    order = np.argsort(image_ids, kind='stable')
+    image_ids = image_ids[order]
+    classes = classes[order].tolist()
+    boxes = boxes[order].tolist()
+    starts = np.flatnonzero(np.diff(image_ids, prepend=-1))
+    ends = np.append(starts[1:], len(image_ids))
+
     labels = {}
-    a = json.load(open(set, "rb"))
-    for annot in tqdm(a['annotations'], desc=f"Converting {set} to YOLOv5 format..."):
-        img_id = annot['image_id']
-        img_name = a['images'][img_id]['name']
-        img_label_name = f'{img_name[:-3]}txt'
-
-        cls = annot['category_id']  # instance class id
-        x_center, y_center, width, height = annot['bbox']
-        x_center = (x_center + width / 2) / 1920.0  # offset and scale
-        y_center = (y_center + height / 2) / 1200.0  # offset and scale
-        width /= 1920.0  # scale
-        height /= 1200.0  # scale
-
-        img_dir = set.parents[2] / 'Argoverse-1.1' / 'labels' / a['seq_dirs'][a['images'][annot['image_id']]['sid']]
-        if not img_dir.exists():
-            img_dir.mkdir(parents=True, exist_ok=True)
-
-        k = str(img_dir / img_label_name)
-        if k not in labels:
-            labels[k] = []
-        labels[k].append(f"{cls} {x_center} {y_center} {width} {height}\n")
-
-    for k in labels:
-        with open(k, "w") as f:
-            f.writelines(labels[k])
-
-
-# Download 'https://argoverse-hd.s3.us-east-2.amazonaws.com/Argoverse-HD-Full.zip' (deprecated S3 link)
+    for img_id, start, end in zip(image_ids[starts].tolist(), starts.tolist(), ends.tolist()):
+        k = (seq_dirs[sids[img_id]], names[img_id])
+        labels[k] = ''.join(f"{cls} {x_center} {y_center} {width} {height}\n"
+                            for cls, (x_center, y_center, width, height) in zip(classes[start:end], boxes[start:end]))
+    if include_empty:
+        for img_id, name in enumerate(names):
+            labels.setdefault((seq_dirs[sids[img_id]], name), '')
+    return labels
+
+def write_label_file(item):
+    label_path, text = item
+    with open(label_path, "w") as f:
+        f.write(text)
+
+def argoverse2yolo(set, threads=WRITER_THREADS):
+    labels_dir = set.parents[2] / 'Argoverse-1.1' / 'labels'
+    labels = argoverse_labels(set)
+
+    # Each sequence directory is created once up front instead of checked for every label
+    for seq_dir in {seq_dir for seq_dir, _ in labels}:
+        (labels_dir / seq_dir).mkdir(parents=True, exist_ok=True)
+
+    items = [(labels_dir / seq_dir / f'{img_name[:-3]}txt', text) for (seq_dir, img_name), text in labels.items()]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in tqdm(pool.map(write_label_file, items), total=len(items), desc=f"Writing {set.stem} labels"):
+            pass
+
+def image_bytes(images, seq_dir, img_name):
+    # images is the extracted images/ folder, or (archive path, member prefix of its tracking/ tree)
+    if isinstance(images, tuple):
+        archive_path, prefix = images
+        return archive_reader(archive_path).read(f'{prefix}{seq_dir}/{img_name}')
+    return (images / seq_dir / img_name).read_bytes()
+
+def image_inputs(images, samples):
+    # Files the shard images come from: the archive, or every image of the extracted tree
+    if isinstance(images, tuple):
+        return [images[0]]
+    return [images / seq_dir / img_name for (seq_dir, img_name), _ in samples]
+
+def write_argoverse_shard(item):
+    tar_path, images, samples, signature = item
+    return write_shard(tar_path, ((f'{seq_dir}/{img_name[:-4]}',
+                                   {'jpg': image_bytes(images, seq_dir, img_name), 'txt': text.encode()})
+                                  for (seq_dir, img_name), text in samples), signature=signature)
+
+def write_argoverse_shards(labels, shards_dir, prefix, images, samples_per_shard=SAMPLES_PER_SHARD):
+    shards_dir.mkdir(parents=True, exist_ok=True)
+
+    samples = sorted(labels.items())
+    shards = []
+    for shard_index, shard_samples in enumerate(chunk(samples, samples_per_shard)):
+        tar_path = str(shards_dir / shard_name(prefix, shard_index))
+        # The label text is part of the signature, so re-exported annotations rebuild the shard
+        labels_hash = hashlib.sha1(''.join(text for _, text in shard_samples).encode()).hexdigest()
+        signature = shard_signature(image_inputs(images, shard_samples), {'converter': 'Argoverse2yolo', 'labels': labels_hash})
+        if not shard_is_complete(tar_path, [f'{seq_dir}/{img_name[:-4]}' for (seq_dir, img_name), _ in shard_samples], signature):
+            shards.append((tar_path, images, shard_samples, signature))
+
+    with Pool(processes=cpu_count()) as pool:
+        for _ in tqdm(pool.imap_unordered(write_argoverse_shard, shards), total=len(shards), desc=f"Writing {prefix} shards"):
+            pass
+
+def argoverse2yolo_shards(set, samples_per_shard=SAMPLES_PER_SHARD):
+    # Image + label samples streamed into Argoverse-1.1/shards/<split>-NNNNNN.tar instead of loose files
+    root = set.parents[2] / 'Argoverse-1.1'
+    write_argoverse_shards(argoverse_labels(set), root / 'shards', set.stem, root / 'images', samples_per_shard)
+
+def archive_split(archive_path, split):
+    # <root>/Argoverse-HD/annotations/<split> and the <root>/Argoverse-1.1/tracking/ member prefix
+    archive = archive_reader(archive_path)
+    annotations = archive.find(f'Argoverse-HD/annotations/{split}')
+    images_prefix = annotations[:annotations.index('Argoverse-HD/annotations/')] + 'Argoverse-1.1/tracking/'
+    return archive, annotations, images_prefix
+
+def write_archive_sample(item):
+    archive_path, image_member, image_path, label_path, text = item
+    archive = archive_reader(archive_path)
+    # Images copied completely by an earlier run are kept; new ones are renamed into place
+    if not (image_path.exists() and image_path.stat().st_size == archive.size(image_member)):
+        tmp_path = image_path.with_name(image_path.name + '.tmp')
+        with archive.open(image_member) as src, open(tmp_path, 'wb') as dst:
+            dst.write(src.read())
+        os.replace(tmp_path, image_path)
+    if text:
+        write_label_file((label_path, text))
+
+def archive2yolo(archive_path, split, dir, threads=WRITER_THREADS):
+    """Write Argoverse-1.1/images and labels for one split straight from the local Argoverse-HD zip or tar.
+
+    Annotations are streamed out of the archive and every image of the split is copied from its
+    member, in parallel; nothing is unpacked to an intermediate tree and nothing is downloaded.
+    """
+    archive, annotations, images_prefix = archive_split(archive_path, split)
+    labels = argoverse_labels(annotations, include_empty=True, archive=archive)
+
+    root = dir / 'Argoverse-1.1'
+    for seq_dir in {seq_dir for seq_dir, _ in labels}:
+        (root / 'images' / seq_dir).mkdir(parents=True, exist_ok=True)
+        (root / 'labels' / seq_dir).mkdir(parents=True, exist_ok=True)
+
+    items = [(str(archive_path), f'{images_prefix}{seq_dir}/{img_name}', root / 'images' / seq_dir / img_name,
+              root / 'labels' / seq_dir / f'{img_name[:-3]}txt', text)
+             for (seq_dir, img_name), text in labels.items()]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in tqdm(pool.map(write_archive_sample, items), total=len(items), desc=f"Extracting {Path(split).stem}"):
+            pass
+
+def archive2yolo_shards(archive_path, split, dir, samples_per_shard=SAMPLES_PER_SHARD):
+    # Shards built from the archive members directly, as argoverse2yolo_shards does from an extracted tree
+    archive, annotations, images_prefix = archive_split(archive_path, split)
+    labels = argoverse_labels(annotations, archive=archive)
+    write_argoverse_shards(labels, dir / 'Argoverse-1.1' / 'shards', Path(split).stem,
+                           (str(archive_path), images_prefix), samples_per_shard)
+
+
 dir = Path(yaml['path'])  # dataset root dir
 urls = ['/media/kisna/dataset/ComputerVision/Argoverse-HD-Full.zip']
-download(urls, dir=dir)
 
-# Convert
+# 'archive' converts straight out of the local zip/tar above: offline, no unpacked copy on disk.
+# 'extract' downloads and unpacks it first, then renames 'tracking' to 'images'
+ingest = 'archive'
+
 annotations_dir = 'Argoverse-HD/annotations/'
-(dir / 'Argoverse-1.1' / 'tracking').rename(dir / 'Argoverse-1.1' / 'images')  # rename 'tracking' to 'images'
-for d in "train.json", "val.json":
-    argoverse2yolo(dir / annotations_dir / d)  # convert Argoverse annotations to YOLO labels
\ No newline at end of file
+if ingest == 'archive':
+    for d in "train.json", "val.json":
+        archive2yolo(urls[0], d, dir)  # write Argoverse-1.1/images + labels from the archive
+        # archive2yolo_shards(urls[0], d, dir)  # or write image + label tar shards
+else:
+    from ultralytics.utils.downloads import download
+
+    # Download 'https://argoverse-hd.s3.us-east-2.amazonaws.com/Argoverse-HD-Full.zip' (deprecated S3 link)
+    download(urls, dir=dir)
+
+    # Convert
+    (dir / 'Argoverse-1.1' / 'tracking').rename(dir / 'Argoverse-1.1' / 'images')  # rename 'tracking' to 'images'
+    for d in "train.json", "val.json":
+        argoverse2yolo(dir / annotations_dir / d)  # convert Argoverse annotations to YOLO labels
+        # argoverse2yolo_shards(dir / annotations_dir / d)  # or write image + label tar shards
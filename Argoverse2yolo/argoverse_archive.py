@@ -0,0 +1,60 @@
+import os
+import tarfile
+import zipfile
+import threading
+
+class ArchiveReader:
+    """Random access to the members of a local .zip or uncompressed .tar, without extracting it.
+
+    Every thread gets its own handle on the archive, so members can be read in parallel.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        if zipfile.is_zipfile(self.path):
+            self.kind = 'zip'
+            with zipfile.ZipFile(self.path) as zf:
+                self.members = {info.filename: info for info in zf.infolist() if not info.is_dir()}
+        else:
+            # 'r:' refuses compressed tars: their members can only be read front to back
+            self.kind = 'tar'
+            with tarfile.open(self.path, 'r:') as tf:
+                self.members = {info.name: info for info in tf.getmembers() if info.isfile()}
+
+    def _handle(self):
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            handle = zipfile.ZipFile(self.path) if self.kind == 'zip' else tarfile.open(self.path, 'r:')
+            self._local.handle = handle
+        return handle
+
+    def open(self, name):
+        # Streaming binary file object for one member
+        if self.kind == 'zip':
+            return self._handle().open(self.members[name])
+        return self._handle().extractfile(self.members[name])
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def size(self, name):
+        info = self.members[name]
+        return info.file_size if self.kind == 'zip' else info.size
+
+    def find(self, suffix):
+        # Shortest member path ending in suffix, so the archive's top-level folder does not matter
+        matches = [name for name in self.members if name.endswith(suffix)]
+        if not matches:
+            raise FileNotFoundError(f"{suffix} not found in {self.path}")
+        return min(matches, key=len)
+
+_readers = {}
+
+def archive_reader(path):
+    # One reader per archive and process; forked workers must not share the parent's file handles
+    key = (str(path), os.getpid())
+    if key not in _readers:
+        _readers[key] = ArchiveReader(path)
+    return _readers[key]
@@ -0,0 +1,78 @@
+import numpy as np
+from scipy import stats
+
+# 16-bit frames are handled through one histogram and one uint16 -> uint8 lookup table:
+# statistics cost O(bins) instead of a sort over every pixel, and applying them is a single gather
+HIST_BINS = 65536
+
+def histogram_u16(image):
+    return np.bincount(image.ravel(), minlength=HIST_BINS)
+
+def histogram_range(hist):
+    # Darkest and brightest value present, i.e. what rescale_intensity maps to 0 and 1
+    present = np.flatnonzero(hist)
+    return int(present[0]), int(present[-1])
+
+def normalized_bins(lo, hi):
+    # Value of every bin after min/max normalisation to [0, 1]
+    return np.clip((np.arange(HIST_BINS) - lo) / max(hi - lo, 1), 0, 1)
+
+def stretch_lut(lo, hi):
+    # Min/max normalisation and img_as_ubyte in one uint16 -> uint8 table (exactly the same rounding)
+    return np.rint(normalized_bins(lo, hi) * 255).astype(np.uint8)
+
+def histogram_stats(hist, lo, hi):
+    """Mean, median and skewness of the min/max normalised frame, computed from its histogram."""
+    values = normalized_bins(lo, hi)
+    n = hist.sum()
+    mean = hist @ values / n
+
+    # np.median: the middle value, or the mean of the two middle values for an even count
+    cdf = np.cumsum(hist)
+    lower = values[np.searchsorted(cdf, (n - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cdf, n // 2, side='right')]
+    median = (lower + upper) / 2
+
+    # Biased sample skewness, as scipy.stats.skew computes it
+    centered = values - mean
+    m2 = hist @ centered ** 2 / n
+    m3 = hist @ centered ** 3 / n
+    skewness = m3 / m2 ** 1.5 if m2 > 0 else 0.0
+    return mean, median, skewness
+
+def agc_gamma(skewness, alpha=1.0):
+    # Determine gamma based on skewness
+    if skewness < 0:
+        gamma = 1 - skewness
+    else:
+        gamma = 1 / (1 + skewness)
+    return gamma * alpha
+
+def agc_lut(hist, alpha=1.0):
+    """uint16 -> uint8 table doing min/max normalisation, adaptive gamma and 8-bit conversion."""
+    lo, hi = histogram_range(hist)
+    _, _, skewness = histogram_stats(hist, lo, hi)
+    corrected = np.power(normalized_bins(lo, hi), agc_gamma(skewness, alpha))
+
+    # Normalise the corrected values to [0, 1]; lo and hi map to 0 and 1 already unless gamma is 0
+    span = corrected[hi] - corrected[lo]
+    if span > 0:
+        corrected = np.clip((corrected - corrected[lo]) / span, 0, 1)
+
+    # Same rounding as img_as_ubyte
+    return np.rint(corrected * 255).astype(np.uint8)
+
+def to_u16_range(image, lo, hi):
+    # Back from a [0, 1] float image (e.g. after upscaling the normalised frame) to LUT indices
+    return np.rint(np.clip(image, 0, 1) * (hi - lo) + lo).astype(np.uint16)
+
+def adaptive_gamma_correction_u16(image, alpha=1.0):
+    """Adaptive gamma correction of a native uint16 frame straight to uint8."""
+    return agc_lut(histogram_u16(image), alpha)[image]
+
+def adaptive_gamma_correction(image, alpha=1.0):
+    # Reference float implementation over every pixel, kept to check the LUT version against
+    image_flattened = image.flatten()
+    skewness = stats.skew(image_flattened)
+    corrected = np.power(image, agc_gamma(skewness, alpha))
+    return (corrected - corrected.min()) / (corrected.max() - corrected.min())
@@ -1,5 +1,15 @@
 import numpy as np
 from skimage import io, exposure, img_as_uint, img_as_ubyte, transform
+from resampling import resample
+from agc_lut import histogram_u16, histogram_range, stretch_lut
+
+# Upscaling backend (see resampling.RESAMPLERS): 'skimage' is the original bicubic spline,
+# 'cv2_cubic' / 'cv2_lanczos' / 'cv2_area' are much faster, 'none' keeps the native size
+resampler = 'skimage'
+
+# Convert to 8-bit at the native size and zoom the single uint8 channel, instead of zooming the
+# float64 frame and converting afterwards (same tones, a fraction of the work)
+native_8bit = False
 
 # Load the 16-bit monochrome image
 image = io.imread('/media/parashuram/AutoData2/city/Denmark/Copenhagen/16BitImages/output/1.png', as_gray=True)
@@ -12,11 +22,15 @@ if image is None:
 # Normalize the image to the range [0, 1]
 image_normalized = exposure.rescale_intensity(image, out_range=(0, 1))
 
-# Zoom the image to 2x using bicubic interpolation
-image_zoomed = transform.rescale(image_normalized, scale=2, order=3, mode='reflect', anti_aliasing=True)
+if native_8bit:
+    # Normalisation and 8-bit conversion in one lookup, then the 2x zoom
+    image_8bit = resample(stretch_lut(*histogram_range(histogram_u16(image)))[image], scale=2, method=resampler)
+else:
+    # Zoom the image to 2x using bicubic interpolation
+    image_zoomed = resample(image_normalized, scale=2, method=resampler)
 
-# Convert the zoomed image to 8-bit for RGB conversion
-image_8bit = img_as_ubyte(image_zoomed)
+    # Convert the zoomed image to 8-bit for RGB conversion
+    image_8bit = img_as_ubyte(image_zoomed)
 
 # Create a 24-bit RGB image by stacking the 8-bit image into three channels
 image_rgb = np.stack([image_8bit] * 3, axis=-1)
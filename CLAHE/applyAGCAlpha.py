@@ -1,28 +1,15 @@
 import numpy as np
 from skimage import io, exposure, img_as_uint, img_as_ubyte, transform
-from scipy import stats
+from agc_lut import histogram_u16, histogram_range, agc_lut, to_u16_range
+from resampling import resample
 
-def adaptive_gamma_correction(image, alpha=1.0):
-    image_flattened = image.flatten()
-    mean = np.mean(image_flattened)
-    median = np.median(image_flattened)
-    
-    # Calculate skewness
-    skewness = stats.skew(image_flattened)
-    
-    # Determine gamma based on skewness
-    if skewness < 0:
-        gamma = 1 - skewness
-    else:
-        gamma = 1 / (1 + skewness)
-    
-    # Apply gamma correction
-    corrected = np.power(image, gamma * alpha)
-    
-    # Normalize to [0, 1]
-    corrected = (corrected - corrected.min()) / (corrected.max() - corrected.min())
-    
-    return corrected
+# Upscaling backend (see resampling.RESAMPLERS): 'skimage' is the original bicubic spline,
+# 'cv2_cubic' / 'cv2_lanczos' / 'cv2_area' are much faster, 'none' keeps the native size
+resampler = 'skimage'
+
+# Apply the AGC table to the native frame and zoom the uint8 result, instead of zooming the
+# float64 frame and looking it up afterwards
+native_8bit = False
 
 # Load the 16-bit monochrome image
 image = io.imread('/media/parashuram/AutoData2/city/Denmark/Copenhagen/16BitImages/output/1.png', as_gray=True)
@@ -32,17 +19,22 @@ if image is None:
     print("Error: Image not loaded correctly.")
     exit()
 
+# Histogram of the native 16-bit frame: AGC statistics and the uint16 -> uint8 table come from it
+hist = histogram_u16(image)
+lo, hi = histogram_range(hist)
+lut = agc_lut(hist, alpha=1.0)
+
 # Normalize the image to the range [0, 1]
 image_normalized = exposure.rescale_intensity(image, out_range=(0, 1))
 
-# Zoom the image to 2x using bicubic interpolation
-image_zoomed = transform.rescale(image_normalized, scale=2, order=3, mode='reflect', anti_aliasing=True)
-
-# Apply Adaptive Gamma Correction
-agc_image = adaptive_gamma_correction(image_zoomed)
+if native_8bit:
+    agc_image_8bit = resample(lut[image], scale=2, method=resampler)
+else:
+    # Zoom the image to 2x using bicubic interpolation
+    image_zoomed = resample(image_normalized, scale=2, method=resampler)
 
-# Convert the AGC image to 8-bit for RGB conversion
-agc_image_8bit = img_as_ubyte(agc_image)
+    # Apply Adaptive Gamma Correction and convert to 8-bit for RGB conversion in one lookup
+    agc_image_8bit = lut[to_u16_range(image_zoomed, lo, hi)]
 
 # Create a 24-bit RGB image by stacking the 8-bit image into three channels
 agc_image_rgb = np.stack([agc_image_8bit] * 3, axis=-1)
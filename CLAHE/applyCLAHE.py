@@ -1,5 +1,10 @@
 import numpy as np
 from skimage import io, exposure, img_as_uint, img_as_ubyte, transform
+from clahe_u16 import create_clahe, clahe_16bit, upscale
+
+# Upscaling backend (see resampling.RESAMPLERS): 'skimage' is the original bicubic spline,
+# 'cv2_cubic' / 'cv2_lanczos' / 'cv2_area' are much faster, 'none' keeps the native size
+resampler = 'cv2_cubic'
 
 # Load the 16-bit monochrome image
 image = io.imread('/media/parashuram/AutoData2/city/Denmark/Copenhagen/16BitImages/output/1.png', as_gray=True)
@@ -12,14 +17,13 @@ if image is None:
 # Normalize the image to the range [0, 1]
 image_normalized = exposure.rescale_intensity(image, out_range=(0, 1))
 
-# Zoom the image to 2x using bicubic interpolation
-image_zoomed = transform.rescale(image_normalized, scale=2, order=3, mode='reflect', anti_aliasing=True)
-
-# Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-clahe = exposure.equalize_adapthist(image_zoomed, clip_limit=0.03)
+# Apply CLAHE (Contrast Limited Adaptive Histogram Equalization) on the native 16-bit frame and
+# convert to 8-bit; clahe_u16.py runs the same over a whole folder
+clahe = create_clahe(clip_limit=40.0, tile_grid=(8, 8))
+clahe_image_8bit = clahe_16bit(image, clahe)
 
-# Convert the 16-bit CLAHE image to 8-bit for RGB conversion
-clahe_image_8bit = img_as_ubyte(clahe)
+# Zoom the image to 2x using bicubic interpolation, after contrast enhancement
+clahe_image_8bit = upscale(clahe_image_8bit, scale=2, method=resampler)
 
 # Create a 24-bit RGB image by stacking the 8-bit image into three channels
 clahe_image_rgb = np.stack([clahe_image_8bit] * 3, axis=-1)
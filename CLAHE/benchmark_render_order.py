@@ -0,0 +1,47 @@
+import argparse
+import numpy as np
+
+from benchmark_report import load_frame, psnr, best_time, write_report
+from resampling import RESAMPLERS
+from IRimg2vid import render_frame, to_bgr
+
+# IRimg2vid frame rendering in the current order (normalise, zoom the float64 frame, 8-bit, 3 channels)
+# against native_8bit (8-bit lookup at the native size, zoom the uint8 channel, gray to the encoder).
+# Times include the hand-off to the writer (to_bgr); PSNR of the native order is against the current one.
+
+def time_render(image, in_range, resampler, native_8bit, repeats):
+    return best_time(lambda: to_bgr(render_frame(image, in_range, resampler, native_8bit)), repeats)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the IRimg2vid rendering order')
+    parser.add_argument('--image', type=str, help='16-bit frame to use; a synthetic IR frame if omitted')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--resamplers', nargs='+', default=[r for r in RESAMPLERS if r != 'none'], choices=sorted(RESAMPLERS))
+    parser.add_argument('--output', type=str, default='bench_render_order.json')
+    args = parser.parse_args()
+
+    frame = load_frame(args.image, args.width, args.height)
+    in_range = (int(frame.min()), int(frame.max()))
+
+    results = {}
+    for resampler in args.resamplers:
+        current_time, current = time_render(frame, in_range, resampler, False, args.repeats)
+        native_time, native = time_render(frame, in_range, resampler, True, args.repeats)
+        results[resampler] = {
+            'current_ms': current_time * 1000,
+            'native_8bit_ms': native_time * 1000,
+            'speedup': current_time / native_time,
+            'current_bytes': current.nbytes,
+            'native_8bit_bytes': native.nbytes,
+            'psnr_db': psnr(current[..., 0].astype(np.float64) / 255, native.astype(np.float64) / 255),
+        }
+        r = results[resampler]
+        print(f"{resampler:<12} current {r['current_ms']:8.2f} ms  native_8bit {r['native_8bit_ms']:8.2f} ms  "
+              f"x{r['speedup']:5.1f}  PSNR {r['psnr_db']:6.2f} dB")
+
+    write_report(args.output, vars(args), results, frame=list(frame.shape))
+
+if __name__ == '__main__':
+    main()
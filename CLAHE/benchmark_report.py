@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import platform
+import cv2
+import numpy as np
+import skimage
+
+# Shared by the benchmark_*.py scripts: test frame, timing, PSNR and the JSON report.
+# The benchmarks also exercise the IR video code, so its folder is put on the path here, once.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images2video'))
+
+def synthetic_ir_frame(rng, width, height):
+    # Smooth thermal structure plus sensor noise in a narrow 16-bit band, like the IR recordings
+    small = rng.gamma(2.0, 1.0, size=(height // 16, width // 16))
+    img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return np.clip(20000 + img * 1500 + rng.normal(0, 40, img.shape), 0, 65535).astype(np.uint16)
+
+def load_frame(image_path, width, height):
+    # The given 16-bit frame, or a synthetic IR frame of width x height
+    if image_path:
+        return cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    return synthetic_ir_frame(np.random.default_rng(0), width, height)
+
+def psnr(reference, img):
+    mse = np.mean((reference - img) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(1.0 / mse))
+
+def best_time(fn, repeats):
+    """(best wall time in seconds over repeats calls of fn(), result of the last call)."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), out
+
+def write_report(output_path, params, results, **fields):
+    # Environment first, then any extra fields, the parameters and the results
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': sys.version.split()[0],
+        'opencv': cv2.__version__,
+        'skimage': skimage.__version__,
+        'numpy': np.__version__,
+        **fields,
+        'params': params,
+        'results': results,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output_path}")
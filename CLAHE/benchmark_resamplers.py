@@ -0,0 +1,58 @@
+import argparse
+import numpy as np
+from skimage import exposure
+
+from benchmark_report import load_frame, psnr, best_time, write_report
+from resampling import RESAMPLERS, resample
+
+# Throughput of every upscaling backend per dtype, and PSNR against the original
+# skimage rescale(order=3) of the float64 frame the scripts used to zoom
+
+DTYPES = ['float64', 'float32', 'uint16', 'uint8']
+
+def as_dtype(normalized, dtype):
+    # The [0, 1] normalised frame in each dtype a pipeline may hand to the resampler
+    if dtype in ('uint8', 'uint16'):
+        return np.rint(normalized * np.iinfo(dtype).max).astype(dtype)
+    return normalized.astype(dtype)
+
+def to_unit(img):
+    if np.issubdtype(img.dtype, np.integer):
+        return img.astype(np.float64) / np.iinfo(img.dtype).max
+    return img.astype(np.float64)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the upscaling backends in resampling.py')
+    parser.add_argument('--image', type=str, help='16-bit frame to use; a synthetic IR frame if omitted')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('--scale', type=float, default=2)
+    parser.add_argument('--repeats', type=int, default=5)
+    # 'none' does not zoom, so it has no output to compare with the zoomed reference
+    zooming = [r for r in RESAMPLERS if r != 'none']
+    parser.add_argument('--resamplers', nargs='+', default=zooming, choices=sorted(zooming))
+    parser.add_argument('--output', type=str, default='bench_resamplers.json')
+    args = parser.parse_args()
+
+    frame = load_frame(args.image, args.width, args.height)
+    normalized = exposure.rescale_intensity(frame, out_range=(0, 1))
+    reference = resample(normalized, args.scale, 'skimage')
+
+    results = {}
+    for method in args.resamplers:
+        results[method] = {}
+        for dtype in DTYPES:
+            img = as_dtype(normalized, dtype)
+            best, out = best_time(lambda: resample(img, args.scale, method), args.repeats)
+            results[method][dtype] = {
+                'ms': best * 1000,
+                'mpix_per_sec': out.size / best / 1e6,
+                'psnr_db': psnr(reference, to_unit(out)),
+            }
+            print(f"{method:<12} {dtype:<8} {best * 1000:8.2f} ms  {out.size / best / 1e6:8.1f} Mpx/s  "
+                  f"PSNR {results[method][dtype]['psnr_db']:6.2f} dB")
+
+    write_report(args.output, vars(args), results, frame=list(frame.shape))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import os
+import argparse
+import tracemalloc
+import cv2
+import numpy as np
+from skimage import exposure, img_as_ubyte
+
+from benchmark_report import synthetic_ir_frame, psnr, best_time, write_report
+from resampling import RESAMPLERS, resample
+from agc_lut import histogram_u16, histogram_range, agc_lut, to_u16_range, adaptive_gamma_correction_u16
+from clahe_u16 import CLIP_LIMIT, TILE_GRID, create_clahe, clahe_16bit
+from tone_mapping import tone_map_frame
+
+# Speed and quality of every 16-bit -> 8-bit operator, at several resolutions, with and without the zoom.
+# Quality: entropy and RMS contrast of the 8-bit result, and PSNR against the plain min/max stretch
+# of the same frame (applyAGC.py with the skimage zoom, or unzoomed for --resampler none), i.e. how far an operator moves away from it.
+
+def minmax_stretch(img, scale, method):
+    # applyAGC.py: normalise, zoom the float frame, img_as_ubyte
+    return img_as_ubyte(resample(exposure.rescale_intensity(img, out_range=(0, 1)), scale, method))
+
+def agc_float_zoom(img, scale, method):
+    # applyAGCAlpha.py: AGC table from the 16-bit histogram, applied after zooming the normalised frame
+    hist = histogram_u16(img)
+    lo, hi = histogram_range(hist)
+    zoomed = resample(exposure.rescale_intensity(img, out_range=(0, 1)), scale, method)
+    return agc_lut(hist, alpha=1.0)[to_u16_range(zoomed, lo, hi)]
+
+def agc_native(img, scale, method):
+    # AGC straight to 8-bit on the native frame, then the zoom
+    return resample(adaptive_gamma_correction_u16(img), scale, method)
+
+_clahe = create_clahe(CLIP_LIMIT, TILE_GRID)
+
+def clahe_native(img, scale, method):
+    # applyCLAHE.py / clahe_u16.py
+    return resample(clahe_16bit(img, _clahe), scale, method)
+
+def clahe_skimage(img, scale, method):
+    # The float equalize_adapthist CLAHE applyCLAHE.py used before clahe_u16
+    zoomed = resample(exposure.rescale_intensity(img, out_range=(0, 1)), scale, method)
+    return img_as_ubyte(exposure.equalize_adapthist(zoomed, clip_limit=0.03))
+
+def percentile_stretch(img, scale, method):
+    # infrered_agc_img_2_vid.py / display with 1-99% bounds
+    return resample(tone_map_frame(img, percentiles=(1.0, 99.0)), scale, method)
+
+def count_stretch(img, scale, method):
+    # infrered_agc_img_2_vid.py with its 10-pixel count thresholds
+    return resample(tone_map_frame(img, min_count=10, max_count=10), scale, method)
+
+OPERATORS = {
+    'minmax': minmax_stretch,
+    'agc': agc_float_zoom,
+    'agc_native': agc_native,
+    'clahe': clahe_native,
+    'clahe_skimage': clahe_skimage,
+    'percentile': percentile_stretch,
+    'count': count_stretch,
+}
+
+def entropy(img):
+    p = np.bincount(img.ravel(), minlength=256) / img.size
+    p = p[p > 0]
+    return float(-(p * np.log2(p)).sum())
+
+def rms_contrast(img):
+    return float(img.std() / 255)
+
+def peak_memory(operator, img, scale, method):
+    # Python / numpy allocations only; OpenCV's internal scratch buffers are not traced
+    tracemalloc.start()
+    operator(img, scale, method)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the 16-bit tone-mapping operators')
+    parser.add_argument('--images', type=str, nargs='*', default=[], help='Sample 16-bit frames, benchmarked at their own size')
+    parser.add_argument('--sizes', type=parse_size, nargs='*', default=[(320, 256), (640, 512), (1280, 1024)],
+                        help='Synthetic frame sizes, WIDTHxHEIGHT')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 2], help='Zoom factors (1 = no upscale)')
+    parser.add_argument('--resampler', type=str, default='skimage', choices=sorted(RESAMPLERS))
+    parser.add_argument('--operators', nargs='+', default=list(OPERATORS), choices=list(OPERATORS))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', type=str, default='bench_tone_mapping.json')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [(f'synthetic_{w}x{h}', synthetic_ir_frame(rng, w, h)) for w, h in args.sizes]
+    for path in args.images:
+        frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if frame is None or frame.dtype != np.uint16:
+            raise ValueError(f"{path}: not a 16-bit frame")
+        frames.append((os.path.basename(path), frame))
+
+    results = []
+    for name, frame in frames:
+        for scale in args.scales:
+            # With --resampler none nothing is zoomed, so the reference stays at the native size too
+            reference_method = 'none' if args.resampler == 'none' else 'skimage'
+            reference = minmax_stretch(frame, scale, reference_method).astype(np.float64) / 255
+            for op_name in args.operators:
+                operator = OPERATORS[op_name]
+                best, out = best_time(lambda: operator(frame, scale, args.resampler), args.repeats)
+                result = {
+                    'frame': name,
+                    'size': [frame.shape[1], frame.shape[0]],
+                    'scale': scale,
+                    'operator': op_name,
+                    'ms_per_frame': best * 1000,
+                    'peak_mb': peak_memory(operator, frame, scale, args.resampler) / 2 ** 20,
+                    'entropy': entropy(out),
+                    'contrast': rms_contrast(out),
+                    'psnr_db': psnr(reference, out.astype(np.float64) / 255),
+                }
+                results.append(result)
+                print(f"{name:<22} x{scale:<4g} {op_name:<14} {result['ms_per_frame']:9.2f} ms  "
+                      f"{result['peak_mb']:7.1f} MB  H {result['entropy']:5.2f}  C {result['contrast']:.3f}  "
+                      f"PSNR {result['psnr_db']:6.2f} dB")
+
+    write_report(args.output, {**vars(args), 'sizes': [list(size) for size in args.sizes]}, results)
+
+if __name__ == '__main__':
+    main()
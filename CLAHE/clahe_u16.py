@@ -0,0 +1,80 @@
+import os
+import argparse
+import multiprocessing
+import cv2
+import numpy as np
+from tqdm import tqdm
+from resampling import RESAMPLERS, resample
+
+# OpenCV CLAHE straight on the native uint16 frame, then 8-bit, then (optionally) the 2x zoom.
+# clip_limit is OpenCV's: a multiple of the mean count over 65536 bins per tile, not skimage's
+# 0..1 fraction. 40 gives about the contrast of equalize_adapthist(clip_limit=0.03) on IR frames
+CLIP_LIMIT = 40.0
+TILE_GRID = (8, 8)
+SCALE = 2
+RESAMPLER = 'cv2_cubic'
+
+# One CLAHE object per worker process, created by the pool initializer
+_clahe = None
+
+def create_clahe(clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID):
+    return cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tuple(tile_grid))
+
+def clahe_16bit(img, clahe):
+    """CLAHE on a uint16 frame, returned as uint8 (top byte, as img_as_ubyte converts uint16)."""
+    if img.dtype != np.uint16:
+        raise ValueError(f"Expected a uint16 frame, got {img.dtype}")
+    return (clahe.apply(img) >> 8).astype(np.uint8)
+
+def upscale(img, scale=SCALE, method=RESAMPLER):
+    # After contrast enhancement, so CLAHE runs on the native (4x smaller) frame
+    return resample(img, scale, method)
+
+def process_frame(img, clahe, scale=SCALE, method=RESAMPLER):
+    # 24-bit RGB (the 8-bit result in all three channels), as applyCLAHE.py saves it
+    return cv2.cvtColor(upscale(clahe_16bit(img, clahe), scale, method), cv2.COLOR_GRAY2BGR)
+
+def init_worker(clip_limit, tile_grid):
+    global _clahe
+    _clahe = create_clahe(clip_limit, tile_grid)
+
+def process_file(args):
+    input_path, output_path, scale, method = args
+    img = cv2.imread(input_path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None
+    cv2.imwrite(output_path, process_frame(img, _clahe, scale, method))
+    return output_path
+
+def clahe_folder(input_folder, output_folder, clip_limit=CLIP_LIMIT, tile_grid=TILE_GRID, scale=SCALE,
+                 method=RESAMPLER, workers=None):
+    """Apply CLAHE to every 16-bit PNG of input_folder with a process pool; returns the frames written."""
+    os.makedirs(output_folder, exist_ok=True)
+    files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith('.png'))
+    tasks = [(os.path.join(input_folder, f), os.path.join(output_folder, f), scale, method) for f in files]
+
+    written = 0
+    with multiprocessing.Pool(processes=workers or multiprocessing.cpu_count(),
+                              initializer=init_worker, initargs=(clip_limit, tile_grid)) as pool:
+        for result in tqdm(pool.imap_unordered(process_file, tasks, chunksize=4), total=len(tasks),
+                           desc="Applying CLAHE", unit="frame"):
+            written += result is not None
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Native uint16 CLAHE over a folder of 16-bit frames')
+    parser.add_argument('input_folder', type=str, help='Folder with 16-bit PNG frames')
+    parser.add_argument('output_folder', type=str, help='Folder for the 8-bit RGB results')
+    parser.add_argument('--clip_limit', type=float, default=CLIP_LIMIT, help='OpenCV clip limit')
+    parser.add_argument('--tile_grid', type=int, nargs=2, default=list(TILE_GRID), help='Tiles across and down')
+    parser.add_argument('--scale', type=float, default=SCALE, help='Zoom after CLAHE (1 = none)')
+    parser.add_argument('--resampler', type=str, default=RESAMPLER, choices=sorted(RESAMPLERS), help='Upscaling backend')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    written = clahe_folder(args.input_folder, args.output_folder, args.clip_limit, args.tile_grid,
+                           args.scale, args.resampler, args.workers)
+    print(f"Wrote {written} frames to {args.output_folder}")
+
+if __name__ == '__main__':
+    main()
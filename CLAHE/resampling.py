@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+from skimage import transform
+
+# Upscaling backends shared by the CLAHE / AGC scripts and images2video/IRimg2vid.py. Every backend
+# takes a 2-D float32/float64, uint8 or uint16 frame and returns the same dtype.
+#   skimage      - transform.rescale(order=3, anti_aliasing=True), the original (slow, float64 inside)
+#   cv2_cubic    - cv2.resize INTER_CUBIC
+#   cv2_area     - cv2.resize INTER_AREA
+#   cv2_lanczos  - cv2.resize INTER_LANCZOS4
+#   none         - no resampling
+
+def _cv2_resize(interpolation):
+    def resize(img, scale):
+        out = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+        if np.issubdtype(img.dtype, np.floating):
+            # Integer types saturate in cv2; clip floats to the input range like skimage does
+            out = np.clip(out, img.min(), img.max(), out=out)
+        return out
+    return resize
+
+def _skimage_rescale(img, scale):
+    out = transform.rescale(img, scale=scale, order=3, mode='reflect', anti_aliasing=True, preserve_range=True)
+    if np.issubdtype(img.dtype, np.integer):
+        info = np.iinfo(img.dtype)
+        return np.clip(np.rint(out), info.min, info.max).astype(img.dtype)
+    return out.astype(img.dtype, copy=False)
+
+def _no_resample(img, scale):
+    return img
+
+RESAMPLERS = {
+    'skimage': _skimage_rescale,
+    'cv2_cubic': _cv2_resize(cv2.INTER_CUBIC),
+    'cv2_area': _cv2_resize(cv2.INTER_AREA),
+    'cv2_lanczos': _cv2_resize(cv2.INTER_LANCZOS4),
+    'none': _no_resample,
+}
+
+def resample(img, scale=2, method='skimage'):
+    if method not in RESAMPLERS:
+        raise ValueError(f"Unknown resampler '{method}', expected one of {sorted(RESAMPLERS)}")
+    if not scale or scale == 1:
+        return img
+    return RESAMPLERS[method](img, scale)
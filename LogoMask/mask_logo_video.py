@@ -1,14 +1,20 @@
+import os
+import sys
 import cv2
 import numpy as np
 from tqdm import tqdm
 
+# Shared ffmpeg encoder sink lives with imgs2vid
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imgs2vid'))
+from ffmpeg_writer import open_video_writer
+
 def select_roi(frame):
     # Select ROI
     roi = cv2.selectROI("Select Logo Region", frame, fromCenter=False, showCrosshair=True)
     cv2.destroyWindow("Select Logo Region")
     return roi
 
-def create_mask_video(video_path, output_path):
+def create_mask_video(video_path, output_path, **writer_options):
     # Open video
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
@@ -34,11 +40,10 @@ def create_mask_video(video_path, output_path):
     # Get video properties
     frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    fps = cap.get(cv2.CAP_PROP_FPS)
     
     # Create video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height), isColor=False)
+    out = open_video_writer(output_path, fps, (frame_width, frame_height), is_color=False, **writer_options)
 
     # Process all frames with progress bar
     for _ in tqdm(range(total_frames), desc="Creating mask video"):
@@ -1,8 +1,17 @@
 import os
+import sys
+import multiprocessing
+from collections import deque
 import numpy as np
-from skimage import io, exposure, img_as_ubyte, transform
+from skimage import io, exposure, img_as_ubyte
 import cv2
 from tqdm import tqdm
+from tone_mapping import StreamingToneMapper, frame_bounds, write_video
+
+# Shared upscaling backends live with the CLAHE scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'CLAHE'))
+from resampling import resample
+from agc_lut import stretch_lut
 
 def split_string_between_symbols(input_string, start_symbol, end_symbol):
     start_index = input_string.find(start_symbol)
@@ -11,16 +20,37 @@ def split_string_between_symbols(input_string, start_symbol, end_symbol):
         return input_string[start_index + len(start_symbol):end_index]
     return None
 
-def process_image(image_path):
-    image = io.imread(image_path, as_gray=True)
-    image_normalized = exposure.rescale_intensity(image, out_range=(0, 1))
-    image_zoomed = transform.rescale(image_normalized, scale=2, order=3, mode='reflect', anti_aliasing=True)
+def process_image(image_path, tone_mapper=None, resampler='skimage', native_8bit=False):
+    return process_frame(io.imread(image_path, as_gray=True), tone_mapper, resampler, native_8bit)
+
+def process_frame(image, tone_mapper=None, resampler='skimage', native_8bit=False):
+    # A streaming tone mapper gives bounds smoothed over the sequence; otherwise each frame uses its own min/max
+    in_range = tone_mapper.update(image) if tone_mapper is not None else 'image'
+    return render_frame(image, in_range, resampler, native_8bit)
+
+def render_frame(image, in_range='image', resampler='skimage', native_8bit=False):
+    """RGB uint8 frame at 2x; with native_8bit a single-channel uint8 frame, converted before the zoom."""
+    if native_8bit:
+        return render_frame_8bit(image, in_range, resampler)
+    image_normalized = exposure.rescale_intensity(image, in_range=in_range, out_range=(0, 1))
+    image_zoomed = resample(image_normalized, scale=2, method=resampler)
     #image_agc = exposure.equalize_adapthist(image_zoomed, clip_limit=0.03)
     image_8bit = img_as_ubyte(image_zoomed)
     image_rgb = np.stack([image_8bit] * 3, axis=-1)
     return image_rgb
 
-def create_video_from_folder(input_folder, output_video_path, fps=30):
+def render_frame_8bit(image, in_range='image', resampler='skimage'):
+    # Normalise and convert the native 16-bit frame to 8-bit through one lookup table, then zoom the
+    # single uint8 channel: the zoom runs on 1 byte per pixel instead of float64, with no channel stacking
+    lo, hi = (int(image.min()), int(image.max())) if in_range == 'image' else in_range
+    return resample(stretch_lut(lo, hi)[image], scale=2, method=resampler)
+
+def to_bgr(frame):
+    # Gray frames go to the encoder as they are (it expands them itself)
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if frame.ndim == 3 else frame
+
+def list_sequence(input_folder):
+    # frameIndex_N_... files in N order
     files = os.listdir(input_folder)
     file_dict = {}
 
@@ -29,29 +59,61 @@ def create_video_from_folder(input_folder, output_video_path, fps=30):
         if key is not None:
             file_dict[int(key)] = filename
 
-    sorted_keys = sorted(file_dict.keys())
+    return [os.path.join(input_folder, file_dict[key]) for key in sorted(file_dict.keys())]
 
-    first_image_path = os.path.join(input_folder, file_dict[sorted_keys[0]])
-    first_image = process_image(first_image_path)
-    height, width, layers = first_image.shape
+# Pool workers for the pipelined mode
+def bounds_task(args):
+    image_path, percentiles, subsample = args
+    return frame_bounds(io.imread(image_path, as_gray=True), percentiles, subsample)
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+def render_task(args):
+    image_path, in_range, resampler, native_8bit = args
+    return to_bgr(render_frame(io.imread(image_path, as_gray=True), in_range, resampler, native_8bit))
 
-    print("Processing images and creating video...")
-    for key in tqdm(sorted_keys, desc="Processing frames", unit="frame"):
-        image_path = os.path.join(input_folder, file_dict[key])
-        processed_image = process_image(image_path)
-        video.write(cv2.cvtColor(processed_image, cv2.COLOR_RGB2BGR))
+def sequence_bounds(pool, image_paths, tone_mapper):
+    # The smoothed bounds depend on every earlier frame, so they are worked out in order up front:
+    # workers decode the frames for their own bounds, which are then smoothed here in sequence order.
+    # This is a second full decode of every PNG (render_task decodes it again), not a free pass
+    tasks = ((image_path, tone_mapper.percentiles, tone_mapper.subsample) for image_path in image_paths)
+    return [tone_mapper.update_bounds(*bounds)
+            for bounds in tqdm(pool.imap(bounds_task, tasks, chunksize=16), total=len(image_paths),
+                               desc="Computing bounds", unit="frame")]
+
+def render_ordered(pool, tasks, max_pending):
+    """Rendered frames in task order, with at most max_pending frames queued or waiting in the reorder buffer."""
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(render_task, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+def create_video_from_folder(input_folder, output_video_path, fps=30, temporal_smoothing=True, resampler='skimage',
+                             workers=1, max_pending=None, native_8bit=False, **writer_options):
+    """Frames rendered one by one, or with workers > 1 by a process pool feeding the encoder in order.
 
-    cv2.destroyAllWindows()
-    video.release()
+    native_8bit converts to 8-bit before the 2x zoom and encodes single-channel frames (see render_frame_8bit).
+    """
+    image_paths = list_sequence(input_folder)
+    tone_mapper = StreamingToneMapper(percentiles=(0.0, 100.0)) if temporal_smoothing else None
+
+    print("Processing images and creating video...")
+    if workers > 1:
+        with multiprocessing.Pool(processes=workers) as pool:
+            bounds = sequence_bounds(pool, image_paths, tone_mapper) if tone_mapper is not None else ['image'] * len(image_paths)
+            tasks = ((image_path, in_range, resampler, native_8bit) for image_path, in_range in zip(image_paths, bounds))
+            frames = render_ordered(pool, tasks, max_pending or 4 * workers)
+            write_video(frames, output_video_path, fps, len(image_paths), **writer_options)
+    else:
+        frames = (to_bgr(process_image(image_path, tone_mapper, resampler, native_8bit)) for image_path in image_paths)
+        write_video(frames, output_video_path, fps, len(image_paths), **writer_options)
 
 def main():
     input_folder = '/media/parashuram/AutoData2/city/Germany/Hamburg/2019-12-01_13.30.01_done/16BitFrames/'
     output_video_path = 'output_video.mp4'
 
-    create_video_from_folder(input_folder, output_video_path)
+    create_video_from_folder(input_folder, output_video_path, workers=multiprocessing.cpu_count())
     
     print(f"Video created: {output_video_path}")
 
@@ -4,6 +4,7 @@ from cv2 import sort
 import numpy as np
 import natsort
 from matplotlib import pyplot as plt
+from histogram_index import open_index, BIN_SHIFT
 
 def check_file_exists(folder_path, file_name):
     file_path = os.path.join(folder_path, file_name)
@@ -27,13 +28,23 @@ def applyAGC(img):
     hist = hist.flatten()
     return hist
 
+# Histograms from the histogram_index.py sidecar when there is an up-to-date one (4096 bins), else per frame
+hist_index = open_index(folder_path)
+
 for filename in dir_list1:
+    if not filename.endswith(suffix):
+        continue
     img = cv2.imread(os.path.join(folder_path, filename), -1)
     # equ = cv2.equalizeHist(img)
-    histr = cv2.calcHist([img], [0], None, [65535], [0, 65535], accumulate=False)
-    histr = histr.flatten()
+    if hist_index is not None and filename in hist_index:
+        histr = hist_index.histogram(hist_index.position(filename))
+        bins = np.arange(len(histr)) << BIN_SHIFT
+    else:
+        histr = cv2.calcHist([img], [0], None, [65535], [0, 65535], accumulate=False)
+        histr = histr.flatten()
+        bins = np.arange(len(histr))
     cv2.imshow('Test image',img)
-    plt.plot(histr)
+    plt.plot(bins, histr)
     plt.show()
     cv2.waitKey()
     print(filename)
@@ -0,0 +1,158 @@
+import os
+import argparse
+import multiprocessing
+import cv2
+import numpy as np
+from tqdm import tqdm
+from tone_mapping import list_frames
+from ir_sequence_store import is_store, IRSequenceStore
+
+# Per-frame histograms of a 16-bit sequence, computed once and kept next to the frames:
+#   <folder or store>/histograms.npz   hists (frames, 4096) uint32, names, mins, maxs
+# 4096 bins of 16 values each; the exact per-frame min / max are stored alongside.
+# Tone mappers, viewers and exporters read sequence statistics from it without touching pixels.
+INDEX_FILE = 'histograms.npz'
+INDEX_BINS = 4096
+BIN_SHIFT = 4  # 65536 >> BIN_SHIFT == INDEX_BINS
+
+# Open store of the worker process, set by the pool initializer when indexing a store
+_store = None
+
+def index_path(path):
+    return os.path.join(path, INDEX_FILE)
+
+def has_index(path):
+    return os.path.isfile(index_path(path))
+
+def index_is_current(path):
+    # Not older than the folder or any file in it (frames added or rewritten after indexing make it stale)
+    if not has_index(path):
+        return False
+    newest = os.path.getmtime(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name != INDEX_FILE:
+                newest = max(newest, entry.stat().st_mtime)
+    return os.path.getmtime(index_path(path)) >= newest
+
+def open_index(path):
+    """HistogramIndex of path if its sidecar exists and is up to date, else None (compute from the frames)."""
+    return HistogramIndex(path) if index_is_current(path) else None
+
+def frame_histogram(img):
+    """(4096-bin histogram, min, max) of a uint16 frame."""
+    hist = np.bincount((img >> BIN_SHIFT).ravel(), minlength=INDEX_BINS).astype(np.uint32)
+    return hist, int(img.min()), int(img.max())
+
+def file_histogram(image_path):
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if img is None or img.dtype != np.uint16:
+        raise ValueError(f"{image_path}: not a 16-bit frame")
+    return frame_histogram(img)
+
+def init_store_worker(store_path):
+    global _store
+    _store = IRSequenceStore(store_path)
+
+def store_histogram(i):
+    return frame_histogram(_store[i])
+
+def build_index(path, workers=None):
+    """Histogram every frame of a folder (natural sort order) or IRSequenceStore; returns the frame count."""
+    if is_store(path):
+        names = IRSequenceStore(path).sources
+        tasks, worker, initializer, initargs = range(len(names)), store_histogram, init_store_worker, (path,)
+    else:
+        names = list_frames(path)
+        tasks, worker, initializer, initargs = [os.path.join(path, f) for f in names], file_histogram, None, ()
+    if not names:
+        raise FileNotFoundError(f"No frames in {path}")
+
+    hists = np.empty((len(names), INDEX_BINS), dtype=np.uint32)
+    mins = np.empty(len(names), dtype=np.uint16)
+    maxs = np.empty(len(names), dtype=np.uint16)
+    with multiprocessing.Pool(processes=workers or multiprocessing.cpu_count(),
+                              initializer=initializer, initargs=initargs) as pool:
+        results = pool.imap(worker, tasks, chunksize=8)
+        for i, (hist, lo, hi) in enumerate(tqdm(results, total=len(names), desc="Indexing histograms", unit="frame")):
+            hists[i], mins[i], maxs[i] = hist, lo, hi
+
+    # Written under a temporary name and renamed, so readers never see a partial index
+    tmp_path = index_path(path) + '.tmp.npz'
+    np.savez_compressed(tmp_path, hists=hists, names=np.array(names), mins=mins, maxs=maxs)
+    os.replace(tmp_path, index_path(path))
+    # The rename updates the folder mtime; touch the index after it so index_is_current holds
+    os.utime(index_path(path))
+    return len(names)
+
+def coarse_percentile_bounds(hist, low=1.0, high=99.0):
+    """16-bit values at the low / high percentiles of a 4096-bin histogram (to the 16-value bin)."""
+    cdf = np.cumsum(hist, dtype=np.float64)
+    total = cdf[-1]
+    lo = int(np.searchsorted(cdf, total * low / 100, side='right')) << BIN_SHIFT
+    hi = (int(np.searchsorted(cdf, total * high / 100, side='left')) << BIN_SHIFT) + (1 << BIN_SHIFT) - 1
+    return min(lo, 65534), min(max(hi, lo + 1), 65535)
+
+class HistogramIndex:
+    """Reader for histograms.npz: per-frame and sequence-wide statistics by frame position or name."""
+
+    def __init__(self, path):
+        with np.load(index_path(path) if os.path.isdir(path) else path) as index:
+            self.hists = index['hists']
+            self.names = [str(name) for name in index['names']]
+            self.mins = index['mins']
+            self.maxs = index['maxs']
+        self._position = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._position
+
+    def position(self, name):
+        return self._position[name]
+
+    def histogram(self, i):
+        return self.hists[i]
+
+    def frame_bounds(self, i, percentiles=(1.0, 99.0)):
+        # Clamped to the exact frame range, which the coarse bins round outwards
+        lo, hi = coarse_percentile_bounds(self.hists[i], *percentiles)
+        lo, hi = max(lo, int(self.mins[i])), min(hi, int(self.maxs[i]))
+        return (lo, hi) if hi > lo else (lo, lo + 1)
+
+    def sequence_histogram(self, start=0, stop=None):
+        return self.hists[start:stop].sum(axis=0, dtype=np.uint64)
+
+    def sequence_bounds(self, percentiles=(1.0, 99.0), start=0, stop=None):
+        """One pair of 16-bit bounds for frames [start, stop), e.g. for a flicker-free global LUT."""
+        lo, hi = coarse_percentile_bounds(self.sequence_histogram(start, stop), *percentiles)
+        lo, hi = max(lo, int(self.mins[start:stop].min())), min(hi, int(self.maxs[start:stop].max()))
+        return (lo, hi) if hi > lo else (lo, lo + 1)
+
+    def histogram_distances(self):
+        """Total variation distance (0..1) between consecutive normalised histograms, one per frame after the first."""
+        hists = self.hists.astype(np.float64)
+        hists /= hists.sum(axis=1, keepdims=True)
+        return 0.5 * np.abs(np.diff(hists, axis=0)).sum(axis=1)
+
+    def scene_changes(self, threshold=0.3):
+        # Positions of frames whose histogram jumps by more than threshold from the previous one
+        return np.flatnonzero(self.histogram_distances() > threshold) + 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the per-frame histogram sidecar of a 16-bit sequence')
+    parser.add_argument('path', type=str, help='Folder of 16-bit PNG frames or an ir_sequence_store store')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--scene_threshold', type=float, default=0.3, help='Histogram distance reported as a scene change')
+    args = parser.parse_args()
+
+    count = build_index(args.path, args.workers)
+    index = HistogramIndex(args.path)
+    print(f"Indexed {count} frames into {index_path(args.path)}")
+    print("Sequence bounds (1-99%):", index.sequence_bounds())
+    print("Scene changes at frames:", [index.names[i] for i in index.scene_changes(args.scene_threshold)])
+
+if __name__ == '__main__':
+    main()
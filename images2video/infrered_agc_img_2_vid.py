@@ -1,10 +1,9 @@
 import cv2
-from cv2 import sort
-from cv2 import HISTCMP_CHISQR_ALT
 import numpy as np
 import os
-import natsort
-from matplotlib import pyplot as plt
+from tone_mapping import histogram_16bit, count_bounds, tone_map_lut, tone_map, tone_map_folder_to_video, tone_map_frames_to_video, StreamingToneMapper
+from ir_sequence_store import is_store, IRSequenceStore
+from histogram_index import open_index
 
 def check_file_exists(folder_path, file_name):
     file_path = os.path.join(folder_path, file_name)
@@ -16,61 +15,54 @@ filename1 = 'frameIndex_0_2019-11-15_19.45.59.png'
 
 maxThresold = 10
 minThresold = 10
-histMax = 65535
-histMin = 0
 
-histMaxImg = 32768
-
-img = cv2.imread(os.path.join(folderPath, filename1), -1)
-rows,cols = img.shape
-newImg = np.zeros((rows, cols), dtype = "uint8")
-img_org = np.zeros((rows, cols), dtype = "uint8")
-maxImgValue = np.max(img)
-
-histr = cv2.calcHist([img], [0], None, [65535], [0, 65535], accumulate=False)
-histRange = len(histr) -1
-histogram8bitLUT = np.zeros((histRange,1), dtype=np.uint8)
-histogram8bitLUT_org = np.zeros((histRange,1), dtype=np.uint8)
-
-print("Histgram range: ", histRange)
-
-for iMin in range(histRange):
-    if histr[iMin] > minThresold:
-        histMin = iMin
-        break
-
-for iMax in range(histRange,histMin,-1):
-    if histr[iMax] > maxThresold:
-        histMax = iMax
-        break
-
-histMaxMinDiff = histMax - histMin
-for histIndex in range(histRange):
-    pixindex = int(((histIndex - histMin)*255)/histMaxMinDiff)
-    pixindex_org = (histIndex/maxImgValue)*255
-    if pixindex > 255:
-        pixindex = 255
-    elif pixindex < 0:
-        pixindex = 0
-    histogram8bitLUT[histIndex] = np.uint8(pixindex)
-    histogram8bitLUT_org[histIndex] = np.uint8(pixindex_org)
-
-for i in range(rows):
-    for j in range(cols):
-        newImg[i,j] = histogram8bitLUT[img[i,j]]
-        img_org[i,j] = histogram8bitLUT_org[img[i,j]]
-
-print(img_org[100,100])
-
-HoriImage = np.concatenate((img_org, newImg), axis=1)
-histrNew = cv2.calcHist([newImg], [0], None, [255], [0, 255], accumulate=False)
-
-
-cv2.imshow('Test image',HoriImage)
-# plt.plot(histogram8bitLUT_org)
-# plt.show()
-cv2.waitKey()
-print(filename1)
+# 'preview' shows one frame next to a plain max-scaled version, 'video' tone maps the whole folder
+mode = 'preview'
+output_video_path = 'output_video_agc.mp4'
+
+# In 'video' mode, smooth the bounds over the sequence (no brightness flicker) instead of per frame
+temporal_smoothing = True
+# With a histogram_index.py sidecar, use one LUT from the 1-99% bounds of the whole sequence instead
+sequence_bounds = False
+# Encoder settings passed to ffmpeg_writer.open_video_writer, e.g. {'crf': 18} or {'backend': 'opencv'}
+writer_options = {}
+
+def preview_frame(img):
+    # Thresholds from the histogram, then both 8-bit versions through lookup tables
+    histMin, histMax = count_bounds(histogram_16bit(img), minThresold, maxThresold)
+    print("Histogram bounds: ", histMin, histMax)
+    newImg = tone_map(img, tone_map_lut(histMin, histMax))
+
+    maxImgValue = max(int(np.max(img)), 1)
+    histogram8bitLUT_org = (np.arange(65536) / maxImgValue * 255).clip(0, 255).astype(np.uint8)
+    img_org = tone_map(img, histogram8bitLUT_org)
+
+    print(img_org[100,100])
+
+    HoriImage = np.concatenate((img_org, newImg), axis=1)
+    cv2.imshow('Test image',HoriImage)
+    cv2.waitKey()
+
+if mode == 'preview':
+    img = cv2.imread(os.path.join(folderPath, filename1), -1)
+    preview_frame(img)
+    print(filename1)
+else:
+    tone_mapper = StreamingToneMapper() if temporal_smoothing else None
+    hist_index = open_index(folderPath) if sequence_bounds else None
+    if hist_index is not None:
+        lo, hi = hist_index.sequence_bounds()
+        print("Sequence bounds: ", lo, hi)
+        sequence_lut = tone_map_lut(lo, hi)
+        tone_mapper = lambda img: tone_map(img, sequence_lut)
+    if is_store(folderPath):
+        # A store made by ir_sequence_store.py ingest: frames are sliced from it, not decoded
+        count = tone_map_frames_to_video(IRSequenceStore(folderPath), output_video_path, tone_mapper=tone_mapper,
+                                         writer_options=writer_options, min_count=minThresold, max_count=maxThresold)
+    else:
+        count = tone_map_folder_to_video(folderPath, output_video_path, tone_mapper=tone_mapper,
+                                         writer_options=writer_options, min_count=minThresold, max_count=maxThresold)
+    print(f"Video created: {output_video_path} ({count} frames)")
 
 
 folder_path = '/media/kisna/data2/city/Denmark/Copenhagen/16BitImages/output/'
@@ -81,4 +73,3 @@ for i in range(len(files)):
     file_name = f"{i}{suffix}"
     if check_file_exists(folder_path, file_name) is False:
         print(f"The file '{file_name}' does not exist in the folder.")
-
@@ -0,0 +1,176 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from tqdm import tqdm
+from IRimg2vid import split_string_between_symbols, process_frame, to_bgr
+from tone_mapping import StreamingToneMapper, tone_map_frame, write_video
+
+# A 16-bit IR sequence decoded once into memory-mappable uint16 chunks:
+#   <store>/chunk_000000.npy ...  (frames, height, width) each
+#   <store>/index.json            frame shape, chunk size and (frame number, timestamp, source) per frame
+# Readers slice frames straight out of the mapped chunks, no PNG decode.
+INDEX_FILE = 'index.json'
+CHUNK_FRAMES = 256
+
+def parse_frame_name(filename):
+    """frameIndex_<N>_<timestamp>.png -> (N, timestamp), or None for other names."""
+    frame = split_string_between_symbols(filename, '_', '_')
+    if frame is None or not frame.isdigit():
+        return None
+    rest = filename[filename.find('_', filename.find('_') + 1) + 1:]
+    return int(frame), os.path.splitext(rest)[0]
+
+def chunk_name(chunk_index):
+    return f"chunk_{chunk_index:06d}.npy"
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+def ingest_folder(input_folder, store_path, chunk_frames=CHUNK_FRAMES, threads=8):
+    """Convert a folder of frameIndex_N_<timestamp>.png frames into a chunked uint16 store (frame order)."""
+    frames = []
+    for filename in os.listdir(input_folder):
+        parsed = parse_frame_name(filename)
+        if parsed is not None and filename.endswith('.png'):
+            frames.append((parsed[0], parsed[1], filename))
+    frames.sort()
+    if not frames:
+        raise FileNotFoundError(f"No frameIndex_N_<timestamp>.png frames in {input_folder}")
+
+    first = cv2.imread(os.path.join(input_folder, frames[0][2]), cv2.IMREAD_UNCHANGED)
+    height, width = first.shape
+    os.makedirs(store_path, exist_ok=True)
+
+    chunks = []
+    with ThreadPoolExecutor(max_workers=threads) as pool, tqdm(total=len(frames), desc="Ingesting frames", unit="frame") as pbar:
+        for chunk_index, start in enumerate(range(0, len(frames), chunk_frames)):
+            chunk = frames[start:start + chunk_frames]
+            tmp_path = os.path.join(store_path, chunk_name(chunk_index) + '.tmp')
+            data = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint16, shape=(len(chunk), height, width))
+
+            # Decoder threads write straight into their slot of the mapped chunk
+            def decode(item):
+                slot, (_, _, filename) = item
+                img = cv2.imread(os.path.join(input_folder, filename), cv2.IMREAD_UNCHANGED)
+                if img is None or img.shape != (height, width):
+                    raise ValueError(f"{filename}: not a {width}x{height} 16-bit frame")
+                data[slot] = img
+            for _ in pool.map(decode, enumerate(chunk)):
+                pbar.update(1)
+
+            data.flush()
+            del data
+            os.replace(tmp_path, os.path.join(store_path, chunk_name(chunk_index)))
+            chunks.append(chunk_name(chunk_index))
+
+    # The index goes last, so a store without one is incomplete
+    index = {
+        'shape': [height, width],
+        'dtype': 'uint16',
+        'chunk_frames': chunk_frames,
+        'chunks': chunks,
+        'frames': [frame for frame, _, _ in frames],
+        'timestamps': [timestamp for _, timestamp, _ in frames],
+        'sources': [filename for _, _, filename in frames],
+    }
+    tmp_index = os.path.join(store_path, INDEX_FILE + '.tmp')
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, os.path.join(store_path, INDEX_FILE))
+    return len(frames)
+
+class IRSequenceStore:
+    """Memory-mapped reader: store[i] is the i-th frame (uint16 view), store[a:b] a list of them."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        self.shape = tuple(index['shape'])
+        self.chunk_frames = index['chunk_frames']
+        self.frame_numbers = index['frames']
+        self.timestamps = index['timestamps']
+        self.sources = index['sources']
+        self._chunks = [np.load(os.path.join(path, name), mmap_mode='r') for name in index['chunks']]
+        self._position = {frame: i for i, frame in enumerate(self.frame_numbers)}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._chunks[i // self.chunk_frames][i % self.chunk_frames]
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def frame(self, frame_number):
+        # By the N of frameIndex_N_..., which may have gaps
+        return self[self._position[frame_number]]
+
+def store_to_video(store, output_video_path, fps=30, temporal_smoothing=True, resampler='skimage', native_8bit=False,
+                   **writer_options):
+    """IRimg2vid.create_video_from_folder, reading frames from the store instead of decoding PNGs."""
+    tone_mapper = StreamingToneMapper(percentiles=(0.0, 100.0)) if temporal_smoothing else None
+    frames = (to_bgr(process_frame(image, tone_mapper, resampler, native_8bit)) for image in store)
+    write_video(frames, output_video_path, fps, len(store), **writer_options)
+
+def show_store(store, start=0):
+    # Space: next frame, b: back, q: quit
+    current_index = start
+    while 0 <= current_index < len(store):
+        cv2.imshow('IR sequence', tone_map_frame(store[current_index], percentiles=(1.0, 99.0)))
+        print(store.frame_numbers[current_index], store.timestamps[current_index])
+        key = cv2.waitKey(0) & 0xFF
+        if key == ord(' '):
+            current_index += 1
+        elif key == ord('q'):
+            break
+        elif key == ord('b') and current_index > 0:
+            current_index -= 1
+    cv2.destroyAllWindows()
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked memory-mapped store for 16-bit IR frame sequences')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='Convert a folder of 16-bit PNG frames into a store')
+    ingest.add_argument('input_folder', type=str, help='Folder with frameIndex_N_<timestamp>.png frames')
+    ingest.add_argument('store_path', type=str, help='Output store folder')
+    ingest.add_argument('--chunk_frames', type=int, default=CHUNK_FRAMES, help='Frames per .npy chunk')
+    ingest.add_argument('--threads', type=int, default=8, help='PNG decoder threads')
+
+    video = commands.add_parser('video', help='Export a store to video (IRimg2vid processing)')
+    video.add_argument('store_path', type=str)
+    video.add_argument('output_video_path', type=str)
+    video.add_argument('--fps', type=int, default=30)
+    video.add_argument('--resampler', type=str, default='skimage')
+    video.add_argument('--no_smoothing', action='store_true', help='Normalise every frame on its own')
+    video.add_argument('--native_8bit', action='store_true', help='Convert to 8-bit before the zoom, encode gray frames')
+
+    show = commands.add_parser('show', help='Step through the frames of a store')
+    show.add_argument('store_path', type=str)
+    show.add_argument('--start', type=int, default=0, help='Index of the first frame shown')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        count = ingest_folder(args.input_folder, args.store_path, args.chunk_frames, args.threads)
+        print(f"Stored {count} frames in {args.store_path}")
+    elif args.command == 'video':
+        store_to_video(IRSequenceStore(args.store_path), args.output_video_path, args.fps,
+                       not args.no_smoothing, args.resampler, args.native_8bit)
+        print(f"Video created: {args.output_video_path}")
+    else:
+        show_store(IRSequenceStore(args.store_path), args.start)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import numpy as np
+from tone_mapping import StreamingToneMapper
+
+def normal_frame(rng):
+    return np.clip(rng.normal(24000, 1500, (64, 80)), 0, 65535).astype(np.uint16)
+
+def test_single_hot_frame_decays():
+    # One frame with a 60000 hot spot, then ordinary frames: the bounds must come back to the scene
+    rng = np.random.default_rng(0)
+    for percentiles in ((0.0, 100.0), (1.0, 99.0)):
+        mapper = StreamingToneMapper(percentiles=percentiles)
+        for i in range(100):
+            img = normal_frame(rng)
+            if i == 5:
+                img[:32] = 60000
+            out = mapper(img)
+        lo, hi = mapper.bounds
+        assert hi < 35000, (percentiles, mapper.bounds)
+        assert 60 < out.mean() < 200
+
+def test_min_max_bounds_are_exact():
+    rng = np.random.default_rng(1)
+    img = normal_frame(rng)
+    mapper = StreamingToneMapper(percentiles=(0.0, 100.0))
+    assert mapper.update(img) == (int(img.min()), int(img.max()))
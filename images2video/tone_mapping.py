@@ -0,0 +1,143 @@
+import os
+import sys
+import cv2
+import numpy as np
+import natsort
+from tqdm import tqdm
+
+# Shared ffmpeg encoder sink lives with imgs2vid
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imgs2vid'))
+from ffmpeg_writer import open_video_writer
+
+# 16-bit -> 8-bit tone mapping through one 65536-entry lookup table per frame
+HIST_BINS = 65536
+
+def histogram_16bit(img):
+    return np.bincount(img.ravel(), minlength=HIST_BINS)
+
+def count_bounds(hist, min_count=10, max_count=10):
+    """Lowest / highest value held by more than min_count / max_count pixels (0 / 65535 if none)."""
+    low = np.flatnonzero(hist > min_count)
+    lo = int(low[0]) if len(low) else 0
+    high = np.flatnonzero(hist[lo + 1:] > max_count)
+    hi = lo + 1 + int(high[-1]) if len(high) else HIST_BINS - 1
+    return lo, hi
+
+def percentile_bounds(hist, low=1.0, high=99.0):
+    """Values at the low / high percentiles of the frame, from the cumulative histogram."""
+    cdf = np.cumsum(hist)
+    total = cdf[-1]
+    lo = int(np.searchsorted(cdf, total * low / 100, side='right'))
+    hi = int(np.searchsorted(cdf, total * high / 100, side='left'))
+    return min(lo, HIST_BINS - 2), min(max(hi, lo + 1), HIST_BINS - 1)
+
+def tone_map_lut(lo, hi):
+    # Linear stretch of [lo, hi] to [0, 255], clipped outside, for every 16-bit value at once
+    values = np.arange(HIST_BINS, dtype=np.int64)
+    return np.clip((values - lo) * 255 // (hi - lo), 0, 255).astype(np.uint8)
+
+def tone_map(img, lut):
+    return np.take(lut, img)
+
+def tone_map_frame(img, min_count=10, max_count=10, percentiles=None):
+    """16-bit frame -> 8-bit frame. Bounds come from percentiles (low, high) if given, else pixel-count thresholds."""
+    hist = histogram_16bit(img)
+    if percentiles is not None:
+        lo, hi = percentile_bounds(hist, *percentiles)
+    else:
+        lo, hi = count_bounds(hist, min_count, max_count)
+    return tone_map(img, tone_map_lut(lo, hi))
+
+def frame_bounds(img, percentiles=(1.0, 99.0), subsample=4):
+    """Bounds of one frame for StreamingToneMapper: exact min / max for (0, 100), else the percentiles
+    of every subsample-th pixel. Depends on this frame only, so worker processes can compute it."""
+    if tuple(percentiles) == (0.0, 100.0):
+        return int(img.min()), int(img.max())
+    return percentile_bounds(histogram_16bit(img[::subsample, ::subsample]), *percentiles)
+
+class StreamingToneMapper:
+    """Tone maps a 16-bit sequence with bounds that follow the scene smoothly instead of per frame.
+
+    Every frame gets its own percentile bounds (exact min / max for (0, 100), otherwise from the
+    histogram of every `subsample`-th pixel); the bounds are then an exponential moving average over
+    frames (weight `smoothing` for the newest), so a single outlier frame decays away within a few
+    dozen frames. The LUT is only rebuilt when the smoothed bounds drift by more than `threshold` of
+    the current range, so most frames cost one LUT pass.
+    """
+
+    def __init__(self, percentiles=(1.0, 99.0), smoothing=0.1, threshold=0.02, subsample=4):
+        self.percentiles = percentiles
+        self.smoothing = smoothing
+        self.threshold = threshold
+        self.subsample = subsample
+        self.smoothed = None
+        self.bounds = None
+        self.lut = None
+        self.rebuilds = 0
+
+    def update(self, img):
+        return self.update_bounds(*frame_bounds(img, self.percentiles, self.subsample))
+
+    def update_bounds(self, lo, hi):
+        # Feed the bounds of the next frame, in sequence order
+        if self.smoothed is None:
+            self.smoothed = np.array([lo, hi], dtype=np.float64)
+        else:
+            self.smoothed *= 1 - self.smoothing
+            self.smoothed += self.smoothing * np.array([lo, hi], dtype=np.float64)
+
+        lo, hi = (int(round(v)) for v in self.smoothed)
+        hi = max(hi, lo + 1)
+        if self.bounds is None or self._drifted(lo, hi):
+            self.bounds = (lo, hi)
+            self.lut = tone_map_lut(lo, hi)
+            self.rebuilds += 1
+        return self.bounds
+
+    def _drifted(self, lo, hi):
+        cur_lo, cur_hi = self.bounds
+        limit = self.threshold * (cur_hi - cur_lo)
+        return abs(lo - cur_lo) > limit or abs(hi - cur_hi) > limit
+
+    def __call__(self, img):
+        self.update(img)
+        return tone_map(img, self.lut)
+
+def list_frames(input_folder, suffix='.png'):
+    return natsort.natsorted(f for f in os.listdir(input_folder) if f.endswith(suffix))
+
+def tone_map_folder_to_video(input_folder, output_video_path, fps=30, tone_mapper=None, writer_options=None,
+                             **tone_map_args):
+    """Tone map every 16-bit frame of a folder (natural sort order) straight into a video."""
+    frames = list_frames(input_folder)
+    if not frames:
+        raise FileNotFoundError(f"No frames in {input_folder}")
+    images = (cv2.imread(os.path.join(input_folder, filename), cv2.IMREAD_UNCHANGED) for filename in frames)
+    return tone_map_frames_to_video(images, output_video_path, fps, tone_mapper, total=len(frames),
+                                    writer_options=writer_options, **tone_map_args)
+
+def tone_map_frames_to_video(images, output_video_path, fps=30, tone_mapper=None, total=None, writer_options=None,
+                             **tone_map_args):
+    """Tone map a sequence of 16-bit frames (arrays, e.g. an IRSequenceStore) into a video.
+
+    With a StreamingToneMapper the bounds are smoothed over the sequence, otherwise every
+    frame is stretched on its own (tone_map_frame with tone_map_args). writer_options go to
+    open_video_writer (backend, codec, crf, ...).
+    """
+    frames = (tone_mapper(img) if tone_mapper is not None else tone_map_frame(img, **tone_map_args) for img in images)
+    return write_video(frames, output_video_path, fps, total, **(writer_options or {}))
+
+def write_video(frames, output_video_path, fps, total=None, **writer_options):
+    """Encode 8-bit frames through open_video_writer, the one writer factory of the video scripts.
+    The writer is opened with the size and channels of the first (BGR or gray) frame; returns the frame count."""
+    video = None
+    count = 0
+    for frame in tqdm(frames, total=total, desc="Processing frames", unit="frame"):
+        if video is None:
+            height, width = frame.shape[:2]
+            video = open_video_writer(output_video_path, fps, (width, height), is_color=frame.ndim == 3, **writer_options)
+        video.write(frame)
+        count += 1
+    if video is not None:
+        video.release()
+    return count
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import warnings
+import subprocess
+import cv2
+import numpy as np
+
+# Encoder sink shared by the video-writing scripts: raw BGR (or gray) frames are streamed over stdin
+# to an ffmpeg subprocess, which encodes them (libx264 by default) and can copy the audio track of
+# a source video into the output. Same write() / release() / isOpened() as cv2.VideoWriter.
+CODEC = 'libx264'
+PRESET = 'medium'
+CRF = 23
+THREADS = 0  # 0 = ffmpeg picks
+# Containers that cannot hold every audio codec a source may carry (PCM, Vorbis, ...): audio is re-encoded
+# to AAC for them, so an uncopyable track cannot fail the mux after the whole encode has run
+AAC_CONTAINERS = ('.mp4', '.m4v', '.mov')
+
+def default_audio_codec(output_path):
+    return 'aac' if os.path.splitext(output_path)[1].lower() in AAC_CONTAINERS else 'copy'
+
+class FFmpegVideoWriter:
+    def __init__(self, output_path, fps, frame_size, is_color=True, codec=CODEC, preset=PRESET, crf=CRF,
+                 threads=THREADS, pix_fmt='yuv420p', audio_source=None, audio_offset=0.0, audio_codec=None,
+                 ffmpeg='ffmpeg'):
+        """frame_size is (width, height) like cv2.VideoWriter. audio_source: video whose first audio
+        track is muxed in, starting audio_offset seconds into it (e.g. when frames were skipped).
+        audio_codec: 'aac' for mp4 / mov outputs and 'copy' otherwise if None."""
+        self.output_path = output_path
+        self.frame_size = tuple(frame_size)
+        self.is_color = is_color
+        width, height = self.frame_size
+
+        cmd = [ffmpeg, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'bgr24' if is_color else 'gray',
+               '-s', f'{width}x{height}', '-r', str(fps), '-i', '-']
+        if audio_source:
+            if audio_offset:
+                cmd += ['-ss', str(audio_offset)]
+            cmd += ['-i', audio_source, '-map', '0:v:0', '-map', '1:a:0?', '-c:a', audio_codec or default_audio_codec(output_path), '-shortest']
+        cmd += ['-c:v', codec, '-pix_fmt', pix_fmt, '-threads', str(threads)]
+        if codec in ('libx264', 'libx265'):
+            cmd += ['-preset', preset, '-crf', str(crf)]
+        elif codec == 'libvpx-vp9':
+            cmd += ['-crf', str(crf), '-b:v', '0']
+        cmd.append(output_path)
+
+        # stderr goes to a file: nothing reads it while frames are written, and a full pipe would block ffmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame):
+        if self._process is None:
+            raise RuntimeError(f"Writing to {self.output_path} after the writer was released")
+        height, width = frame.shape[:2]
+        if (width, height) != self.frame_size or (frame.ndim == 3) != self.is_color:
+            raise ValueError(f"Frame {frame.shape} does not match the writer ({self.frame_size}, is_color={self.is_color})")
+        try:
+            self._process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            # ffmpeg exited: release() raises with its error output
+            self.release()
+            raise RuntimeError(f"ffmpeg stopped accepting frames for {self.output_path}")
+
+    def release(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors='replace').strip()
+        self._stderr.close()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.output_path}: {stderr}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def open_video_writer(output_path, fps, frame_size, is_color=True, backend='ffmpeg', **options):
+    """FFmpegVideoWriter, or cv2.VideoWriter with mp4v (backend='opencv', or when ffmpeg is not installed)."""
+    if backend == 'ffmpeg' and shutil.which(options.get('ffmpeg', 'ffmpeg')) is None:
+        warnings.warn("ffmpeg not found, falling back to cv2.VideoWriter (mp4v, no audio)")
+        backend = 'opencv'
+    if backend == 'ffmpeg':
+        return FFmpegVideoWriter(output_path, fps, frame_size, is_color, **options)
+    if backend != 'opencv':
+        raise ValueError(f"Unknown video writer backend '{backend}', expected 'ffmpeg' or 'opencv'")
+    if options.get('audio_source'):
+        warnings.warn("Audio cannot be added using OpenCV. Audio will be ignored.")
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, tuple(frame_size), isColor=is_color)
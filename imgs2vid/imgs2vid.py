@@ -1,18 +1,17 @@
 import cv2
 import os
 from tqdm import tqdm
-import warnings
+from ffmpeg_writer import open_video_writer
 
 def get_video_fps(video_path):
     cap = cv2.VideoCapture(video_path)
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    # Exact rate (e.g. 29.97), so muxed audio stays in sync
+    fps = cap.get(cv2.CAP_PROP_FPS)
     cap.release()
     return fps
 
-def create_video_from_images(image_folder, output_path, fps, audio_path=None):
-    if audio_path:
-        warnings.warn("Audio cannot be added using OpenCV. Audio will be ignored.")
-    
+def create_video_from_images(image_folder, output_path, fps, audio_path=None, **writer_options):
+    # audio_path: video whose audio track is copied into the output (ffmpeg writer only)
     images = sorted([img for img in os.listdir(image_folder) if img.endswith(('.png', '.jpg', '.jpeg'))])
     if not images:
         raise Exception("No images found in the folder")
@@ -25,8 +24,7 @@ def create_video_from_images(image_folder, output_path, fps, audio_path=None):
     height, width = first_image.shape[:2]
 
     # Initialize video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    out = open_video_writer(output_path, fps, (width, height), audio_source=audio_path, **writer_options)
 
     try:
         # Write each image to video
@@ -41,8 +39,7 @@ def create_video_from_images(image_folder, output_path, fps, audio_path=None):
 def main(video_path, image_folder, output_video_path):
     # Get FPS from original video
     fps = get_video_fps(video_path)
-    print(f"Warning: Audio from original video will not be included in the output")
-    create_video_from_images(image_folder, output_video_path, fps=fps)
+    create_video_from_images(image_folder, output_video_path, fps=fps, audio_path=video_path)
 
 if __name__ == "__main__":
     video_path = "/media/kisna/bkp_data/DeOldify/video_data/videos/janeTeriNazroNeKyaKarDiya.mkv"
@@ -1,8 +1,15 @@
 import cv2
 import os
+import sys
 from tqdm import tqdm
 
-def downscale_video(input_path, width, height, start_frame=0):
+# Shared ffmpeg encoder sink lives with imgs2vid, the ffmpeg frame source with video2images
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imgs2vid'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'video2images'))
+from ffmpeg_writer import open_video_writer
+from ffmpeg_reader import open_video_capture
+
+def downscale_video(input_path, width, height, start_frame=0, **writer_options):
     # Extract the video filename without extension
     video_filename = os.path.splitext(os.path.basename(input_path))[0]
     
@@ -10,22 +17,21 @@ def downscale_video(input_path, width, height, start_frame=0):
     output_filename = f"{video_filename}_downscaled.mp4"
     output_path = os.path.join(os.path.dirname(input_path), output_filename)
     
-    cap = cv2.VideoCapture(input_path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, cap.get(cv2.CAP_PROP_FPS), (width, height))
+    # Frames come out of the decoder already at (width, height), starting at start_frame
+    cap = open_video_capture(input_path, width=width, height=height, start_frame=start_frame, interpolation='bilinear')
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    # Audio of the input, starting where the first kept frame does
+    out = open_video_writer(output_path, fps, (width, height), audio_source=input_path,
+                            audio_offset=start_frame / fps if fps else 0.0, **writer_options)
 
     # Get the total number of frames
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    # Set the starting frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-
     with tqdm(total=total_frames - start_frame, desc="Downscaling Video", unit="frame") as pbar:
         while cap.isOpened():
-            ret, frame = cap.read()
+            ret, resized_frame = cap.read()
             if not ret:
                 break
-            resized_frame = cv2.resize(frame, (width, height))
             out.write(resized_frame)
             pbar.update(1)
 
@@ -0,0 +1,218 @@
+import shutil
+import tempfile
+import warnings
+import subprocess
+import cv2
+import numpy as np
+
+# Frame source for the extraction scripts: ffmpeg decodes the video straight into a pipe, with the
+# scaling and the start / duration window applied inside the decoder (no temporary transcode, no
+# per-frame cv2.resize, no CAP_PROP_POS_FRAMES stepping). read() / get() / set() / release() /
+# isOpened() behave like cv2.VideoCapture; frames are BGR uint8 (or gray) NumPy arrays.
+
+def video_info(video_path):
+    """(fps, frame count, width, height) of a video, from its container metadata."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    info = (cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return info
+
+def frame_timestamps(video_path, ffmpeg='ffmpeg'):
+    """Sorted presentation times (seconds, unshifted) of every video packet. Demux only, nothing is decoded."""
+    cmd = [ffmpeg, '-loglevel', 'error', '-nostdin', '-copyts', '-i', video_path, '-map', '0:v:0',
+           '-c', 'copy', '-f', 'framecrc', '-']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed reading {video_path}: {result.stderr.strip()}")
+    time_base, pts = None, []
+    for line in result.stdout.splitlines():
+        if line.startswith('#tb 0:'):
+            num, den = line.split(':')[1].split('/')
+            time_base = int(num) / int(den)
+        elif line and not line.startswith('#'):
+            pts.append(int(line.split(',')[2]))
+    return np.sort(np.array(pts, dtype=np.int64)) * time_base
+
+def is_constant_frame_rate(video_path, fps, ffmpeg='ffmpeg'):
+    """True if frame n sits at n / fps seconds (to a quarter frame), i.e. constant rate and a zero start time:
+    what the -ss seek in FFmpegVideoCapture assumes to land on an exact frame number."""
+    if not fps or shutil.which(ffmpeg) is None:
+        return False
+    pts = frame_timestamps(video_path, ffmpeg)
+    if not len(pts):
+        return False
+    return float(np.abs(pts - np.arange(len(pts)) / fps).max()) < 0.25 / fps
+
+def window_end(start_frame, max_frames, duration, fps):
+    """Frame number the requested window stops at, or None (read to the end of the video).
+    Independent of the container frame count, which can be 0 or -1 for streams and some mkv / VFR files."""
+    ends = []
+    if max_frames is not None:
+        ends.append(start_frame + max_frames)
+    if duration is not None and fps:
+        ends.append(start_frame + int(round(duration * fps)))
+    return min(ends) if ends else None
+
+class FFmpegVideoCapture:
+    def __init__(self, video_path, width=None, height=None, start_frame=0, max_frames=None, duration=None,
+                 gray=False, interpolation='bicubic', threads=0, ffmpeg='ffmpeg'):
+        """width / height: output size (source size if None). The window starts at start_frame and
+        holds at most max_frames frames or duration seconds."""
+        self.video_path = video_path
+        self.gray = gray
+        self.interpolation = interpolation
+        self.threads = threads
+        self.ffmpeg = ffmpeg
+        self._process = None
+        self._stderr = None
+        self.position = 0
+        self.fps, self.frame_count, self.width, self.height = 0.0, 0, 0, 0
+
+        info = video_info(video_path)
+        if info is None:
+            return
+        self.fps, self.frame_count, source_width, source_height = info
+        self.width, self.height = width or source_width, height or source_height
+        self.start_frame = start_frame
+        self.end_frame = window_end(start_frame, max_frames, duration, self.fps)
+        self._frame_bytes = self.width * self.height * (1 if gray else 3)
+        self._open(start_frame)
+
+    def _open(self, frame_number):
+        self.release()
+        self.position = frame_number
+        cmd = [self.ffmpeg, '-loglevel', 'error', '-nostdin', '-threads', str(self.threads)]
+        if frame_number and self.fps:
+            # Input seek: jumps to the keyframe before, then decodes up to the exact frame. Half a frame
+            # early, so rounding of fractional rates (29.97) cannot skip the frame itself
+            cmd += ['-ss', f'{(frame_number - 0.5) / self.fps:.6f}']
+        # -vsync rather than -fps_mode, which ffmpeg 4.x (LTS distributions) does not know
+        cmd += ['-i', self.video_path, '-map', '0:v:0', '-vsync', 'passthrough']
+        if self.end_frame is not None:
+            cmd += ['-frames:v', str(max(self.end_frame - frame_number, 0))]
+        cmd += ['-vf', f'scale={self.width}:{self.height}:flags={self.interpolation}',
+                '-f', 'rawvideo', '-pix_fmt', 'gray' if self.gray else 'bgr24', '-']
+        # stderr goes to a file: an unread pipe would block ffmpeg once it fills up
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self._stderr)
+
+    def isOpened(self):
+        return self._process is not None
+
+    def read(self):
+        if self._process is None:
+            return False, None
+        data = self._process.stdout.read(self._frame_bytes)
+        if len(data) < self._frame_bytes:
+            # End of the stream: the end of the video only if ffmpeg exited cleanly
+            returncode = self._process.wait()
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode(errors='replace').strip()
+            self.release()
+            if returncode != 0:
+                raise RuntimeError(f"ffmpeg failed reading {self.video_path}: {stderr}")
+            return False, None
+        self.position += 1
+        shape = (self.height, self.width) if self.gray else (self.height, self.width, 3)
+        return True, np.frombuffer(data, dtype=np.uint8).reshape(shape).copy()
+
+    def __iter__(self):
+        while True:
+            ret, frame = self.read()
+            if not ret:
+                return
+            yield frame
+
+    def get(self, prop):
+        # Counts and rate of the source; width / height of the frames read() returns
+        values = {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_COUNT: self.frame_count,
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }
+        return float(values.get(prop, 0))
+
+    def set(self, prop, value):
+        # Seeking restarts the decoder at the new position
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._open(int(value))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self._open(int(round(value / 1000 * self.fps)))
+            return True
+        return False
+
+    def release(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        self._stderr.close()
+        self._stderr = None
+
+class OpenCVVideoCapture:
+    """The same frame source on cv2.VideoCapture (seek, resize and window done per frame in Python)."""
+
+    def __init__(self, video_path, width=None, height=None, start_frame=0, max_frames=None, duration=None,
+                 gray=False, interpolation='bicubic', **unused):
+        self._cap = cv2.VideoCapture(video_path)
+        self.gray = gray
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = width or int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = height or int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.interpolation = {'bilinear': cv2.INTER_LINEAR, 'bicubic': cv2.INTER_CUBIC, 'area': cv2.INTER_AREA,
+                              'lanczos': cv2.INTER_LANCZOS4, 'neighbor': cv2.INTER_NEAREST}[interpolation]
+        # Only a requested window stops reading early; the reported frame count can be 0 or -1
+        self.end_frame = window_end(start_frame, max_frames, duration, self.fps)
+        self.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        if self.end_frame is not None and self.position >= self.end_frame:
+            return False, None
+        ret, frame = self._cap.read()
+        if not ret:
+            return False, None
+        self.position += 1
+        if frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=self.interpolation)
+        return True, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if self.gray else frame
+
+    __iter__ = FFmpegVideoCapture.__iter__
+
+    def get(self, prop):
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            return float(self.width if prop == cv2.CAP_PROP_FRAME_WIDTH else self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return self._cap.get(prop)
+
+    def set(self, prop, value):
+        ok = self._cap.set(prop, value)
+        self.position = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES))
+        return ok
+
+    def release(self):
+        self._cap.release()
+
+def open_video_capture(video_path, backend='ffmpeg', **options):
+    """FFmpegVideoCapture, or OpenCVVideoCapture (backend='opencv', or when ffmpeg is not installed)."""
+    if backend == 'ffmpeg' and shutil.which(options.get('ffmpeg', 'ffmpeg')) is None:
+        warnings.warn("ffmpeg not found, falling back to cv2.VideoCapture")
+        backend = 'opencv'
+    if backend == 'ffmpeg':
+        return FFmpegVideoCapture(video_path, **options)
+    if backend != 'opencv':
+        raise ValueError(f"Unknown video capture backend '{backend}', expected 'ffmpeg' or 'opencv'")
+    return OpenCVVideoCapture(video_path, **options)
@@ -1,14 +1,15 @@
 import cv2
 import os
+import multiprocessing
 from tqdm import tqdm
+from ffmpeg_reader import open_video_capture, is_constant_frame_rate
 
 def save_video_frames(video_path, output_base_folder, width=640, height=368, frames_per_folder=2500, start_frame=0):
     # Create the base output folder if it doesn't exist
     os.makedirs(output_base_folder, exist_ok=True)
 
-    # Open the video file with FFMPEG backend
-    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "video_codec;h264"  # Force H264 decoder
-    cap = cv2.VideoCapture(video_path)
+    # Decode with ffmpeg, scaled to (width, height) and starting at start_frame inside the decoder
+    cap = open_video_capture(video_path, width=width, height=height, start_frame=start_frame, interpolation='bilinear')
     
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
@@ -17,9 +18,6 @@ def save_video_frames(video_path, output_base_folder, width=640, height=368, fra
     # Get the total number of frames
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    # Set the starting frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-
     frame_number = 0
     folder_count = 1
     current_folder = os.path.join(output_base_folder, f"video_{folder_count}")
@@ -27,13 +25,10 @@ def save_video_frames(video_path, output_base_folder, width=640, height=368, fra
 
     with tqdm(total=total_frames - start_frame, desc="Processing Frames", unit="frame") as pbar:
         while True:
-            ret, frame = cap.read()
+            ret, resized_frame = cap.read()
             if not ret:
                 break
 
-            # Resize the frame
-            resized_frame = cv2.resize(frame, (width, height))
-
             # Save the frame as an image with maximum PNG compression for best quality
             frame_name = f"{(frame_number % frames_per_folder) + 1:05d}.png"
             frame_path = os.path.join(current_folder, frame_name)
@@ -51,6 +46,66 @@ def save_video_frames(video_path, output_base_folder, width=640, height=368, fra
     # Release the video capture object
     cap.release()
     print(f"Frames saved in folders under: {output_base_folder}")
+    return frame_number
+
+def save_folder_frames(args):
+    """Decode one video_N range in its own ffmpeg and write it; frames past the range (only read by the
+    last range, to the end of the video) continue into the following folders."""
+    video_path, output_base_folder, width, height, frames_per_folder, start_frame, folder_index, last, threads = args
+    first = folder_index * frames_per_folder
+    cap = open_video_capture(video_path, width=width, height=height, start_frame=start_frame + first,
+                             max_frames=None if last else frames_per_folder, interpolation='bilinear', threads=threads)
+    frame_number = first
+    for resized_frame in cap:
+        current_folder = os.path.join(output_base_folder, f"video_{frame_number // frames_per_folder + 1}")
+        if frame_number % frames_per_folder == 0 or frame_number == first:
+            os.makedirs(current_folder, exist_ok=True)
+        frame_name = f"{(frame_number % frames_per_folder) + 1:05d}.png"
+        cv2.imwrite(os.path.join(current_folder, frame_name), resized_frame, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        frame_number += 1
+    cap.release()
+    return frame_number - first
+
+def save_video_frames_parallel(video_path, output_base_folder, width=640, height=368, frames_per_folder=2500,
+                               start_frame=0, workers=None):
+    """save_video_frames with every video_N folder decoded and written by its own process.
+
+    Each range starts with an input seek (ffmpeg decodes from the keyframe before it and drops frames up
+    to the exact first one), so folders and frame names are the same as a sequential run. The seek is by
+    time, which only maps to a frame number for constant frame rate videos starting at 0: anything else
+    (VFR, a start offset) falls back to save_video_frames.
+    """
+    os.makedirs(output_base_folder, exist_ok=True)
+    cap = open_video_capture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}")
+        return
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    if not is_constant_frame_rate(video_path, fps):
+        print(f"{video_path}: variable frame rate or non-zero start time, extracting sequentially")
+        return save_video_frames(video_path, output_base_folder, width, height, frames_per_folder, start_frame)
+
+    workers = workers or multiprocessing.cpu_count()
+    folders = max(-(-(total_frames - start_frame) // frames_per_folder), 1)
+    threads = max(multiprocessing.cpu_count() // workers, 1)
+    # The container frame count can be off, so the last range reads on to the end of the video
+    tasks = [(video_path, output_base_folder, width, height, frames_per_folder, start_frame, i, i == folders - 1, threads)
+             for i in range(folders)]
+
+    written = 0
+    with multiprocessing.Pool(processes=workers) as pool, \
+            tqdm(total=total_frames - start_frame, desc="Processing Frames", unit="frame") as pbar:
+        for count in pool.imap_unordered(save_folder_frames, tasks):
+            written += count
+            pbar.update(count)
+
+    # A sequential run always leaves the next (possibly empty) folder behind
+    os.makedirs(os.path.join(output_base_folder, f"video_{written // frames_per_folder + 1}"), exist_ok=True)
+    print(f"Frames saved in folders under: {output_base_folder}")
+    return written
 
 # Example usage
 if __name__ == "__main__":
@@ -60,20 +115,8 @@ if __name__ == "__main__":
         video_filename = os.path.splitext(os.path.basename(video_path))[0]
         output_base_folder = os.path.join(os.path.dirname(video_path), video_filename)
         
-        # Try to convert the video to H264 format first if needed
-        temp_video_path = os.path.join(output_base_folder, "temp_video.mp4")
-        os.makedirs(output_base_folder, exist_ok=True)
-        
-        # Convert video to H264 format
-        os.system(f'ffmpeg -i "{video_path}" -c:v libx264 -crf 23 "{temp_video_path}" -y')
-        
-        # Use the converted video
-        save_video_frames(temp_video_path if os.path.exists(temp_video_path) else video_path, 
-                         output_base_folder, frames_per_folder=2000, start_frame=1)
-        
-        # Clean up temporary file
-        if os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
-            
+        # ffmpeg reads the source directly, no H264 transcode first; one process per video_N folder
+        save_video_frames_parallel(video_path, output_base_folder, frames_per_folder=2000, start_frame=1)
+
     except Exception as e:
         print(f"Error processing video: {str(e)}")
@@ -1,9 +1,15 @@
 import cv2
 import os
+import sys
 import numpy as np
 from tqdm import tqdm
 from collections import deque
 
+# Shared ffmpeg encoder sink lives with imgs2vid
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imgs2vid'))
+from ffmpeg_writer import open_video_writer
+from ffmpeg_reader import open_video_capture
+
 class TemporalLineDetector:
     def __init__(self, history_length=5, consistency_threshold=0.6, min_line_length=30):
         self.history_length = history_length
@@ -94,7 +100,7 @@ class TemporalLineDetector:
         return mask_3ch
 
 def process_video_frames(video_path, output_base_folder, width=1280, height=720, frames_per_folder=2500, 
-                    start_frame=0, test_mode=False, test_duration_sec=60):
+                    start_frame=0, test_mode=False, test_duration_sec=60, **writer_options):
     # Create the base output folder if it doesn't exist
     os.makedirs(output_base_folder, exist_ok=True)
 
@@ -109,9 +115,9 @@ def process_video_frames(video_path, output_base_folder, width=1280, height=720,
                                        consistency_threshold=0.8,  # Line must appear in 80% of frames
                                        min_line_length=50)  # Minimum vertical line length in pixels
 
-    # Open the video file with FFMPEG backend
-    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "video_codec;h264"
-    cap = cv2.VideoCapture(video_path)
+    # Decode with ffmpeg, scaled to HD and cut to [start_frame, test window) inside the decoder
+    cap = open_video_capture(video_path, width=width, height=height, start_frame=start_frame, interpolation='bilinear',
+                             duration=test_duration_sec if test_mode else None)
     
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
@@ -119,23 +125,20 @@ def process_video_frames(video_path, output_base_folder, width=1280, height=720,
 
     # Get video properties
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    fps = cap.get(cv2.CAP_PROP_FPS)
 
     # If in test mode, only process first minute
     if test_mode:
-        frames_to_process = min(total_frames, fps * test_duration_sec)
+        frames_to_process = min(total_frames, int(fps * test_duration_sec))
         print(f"Test mode: Processing only first {test_duration_sec} seconds ({frames_to_process} frames)")
     else:
         frames_to_process = total_frames
 
-    # Set up video writers for the side-by-side comparison
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    # Set up video writers for the side-by-side comparison, with the audio of the source
     video_name = "test_output.mp4" if test_mode else "combined_output.mp4"
     combined_video_path = os.path.join(output_base_folder, video_name)
-    out = cv2.VideoWriter(combined_video_path, fourcc, fps, (width * 2, height))
-
-    # Set the starting frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    out = open_video_writer(combined_video_path, fps, (width * 2, height), audio_source=video_path,
+                            audio_offset=start_frame / fps if fps else 0.0, **writer_options)
 
     frame_number = 0
     orig_folder_count = mask_folder_count = 1
@@ -146,12 +149,10 @@ def process_video_frames(video_path, output_base_folder, width=1280, height=720,
 
     with tqdm(total=frames_to_process - start_frame, desc="Processing Frames", unit="frame") as pbar:
         while frame_number < frames_to_process:
-            ret, frame = cap.read()
+            # Already at HD resolution
+            ret, resized_frame = cap.read()
             if not ret:
                 break
-
-            # Resize the frame to HD resolution
-            resized_frame = cv2.resize(frame, (width, height))
             
             # Create mask for vertical lines using temporal detection
             mask = line_detector.detect_vertical_lines(resized_frame)
@@ -201,25 +202,9 @@ if __name__ == "__main__":
         folder_suffix = "_test" if test_mode else "_with_masks"
         output_base_folder = os.path.join(os.path.dirname(video_path), f"{video_filename}{folder_suffix}")
         
-        # Try to convert the video to H264 format first if needed
-        temp_video_path = os.path.join(output_base_folder, "temp_video.mp4")
-        os.makedirs(output_base_folder, exist_ok=True)
-        
-        if test_mode:
-            # For test mode, extract only first 30 seconds of video
-            os.system(f'ffmpeg -i "{video_path}" -t 30 -c:v libx264 -crf 23 "{temp_video_path}" -y')
-        else:
-            # Convert full video to H264 format
-            os.system(f'ffmpeg -i "{video_path}" -c:v libx264 -crf 23 "{temp_video_path}" -y')
-        
-        # Process the video frames
-        process_video_frames(temp_video_path if os.path.exists(temp_video_path) else video_path, 
-                           output_base_folder, start_frame=1, 
+        # Process the video frames; ffmpeg reads the source directly (test mode: first 30 seconds)
+        process_video_frames(video_path, output_base_folder, start_frame=1, 
                            test_mode=test_mode, test_duration_sec=30)
-        
-        # Clean up temporary file
-        if os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
-            
+
     except Exception as e:
         print(f"Error processing video: {str(e)}")
\ No newline at end of file